@@ -0,0 +1,202 @@
+import json
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Any, Iterator
+
+import zstandard as zstd
+
+from compact import references
+from kat import SECTIONS, DatamapReader
+
+VERSION = 1
+ORIGIN_SECTIONS = SECTIONS[1:]
+SOURCE, RESULT = 0, 1
+LINE_BITS = 32
+FANOUT_BUCKETS = (0, 1, 4, 16, 64, 256)
+
+
+class DatamapIndex:
+    """Primary key index over a datamap.
+
+    Maps every primary key to the chunk and line of its OOI and of every
+    origin naming it as source or result, packed into integers, so a
+    lookup decompresses a few chunks instead of the whole file. It is kept
+    next to the datamap as `<filename>.idx` and rebuilt when the datamap
+    checksum changes.
+    """
+
+    def __init__(
+        self,
+        reader: DatamapReader,
+        oois: dict[str, int],
+        origins: dict[str, list[int]],
+    ):
+        self.reader = reader
+        self.oois = oois
+        self.origins = origins
+
+    @classmethod
+    def build(cls, reader: DatamapReader) -> "DatamapIndex":
+        oois = {}
+        for chunk in range(reader.chunks("oois")):
+            for line, obj in enumerate(reader.chunk("oois", chunk)):
+                oois[obj["primary_key"]] = chunk << LINE_BITS | line
+        origins: dict[str, list[int]] = {}
+        for section, name in enumerate(ORIGIN_SECTIONS):
+            for chunk in range(reader.chunks(name)):
+                for line, origin in enumerate(reader.chunk(name, chunk)):
+                    location = (chunk << LINE_BITS | line) << 3 | section << 1
+                    origins.setdefault(origin["source"], []).append(location | SOURCE)
+                    for pk in origin["result"]:
+                        origins.setdefault(pk, []).append(location | RESULT)
+        return cls(reader, oois, origins)
+
+    @classmethod
+    def open(cls, reader: DatamapReader, rebuild: bool = False) -> "DatamapIndex":
+        filename = f"{reader.filename}.idx"
+        if not rebuild and os.path.exists(filename):
+            try:
+                with open(filename, "rb") as file:
+                    index = json.loads(zstd.ZstdDecompressor().decompress(file.read()))
+            except (zstd.ZstdError, ValueError):
+                index = {}
+            if (
+                index.get("version") == VERSION
+                and index.get("checksum") == reader.checksum
+            ):
+                return cls(reader, index["oois"], index["origins"])
+        index = cls.build(reader)
+        index.save(filename)
+        return index
+
+    def save(self, filename: str):
+        data = json.dumps(
+            {
+                "version": VERSION,
+                "checksum": self.reader.checksum,
+                "oois": self.oois,
+                "origins": self.origins,
+            },
+            separators=(",", ":"),
+        ).encode()
+        partial = f"{filename}.partial"
+        with open(partial, "wb") as file:
+            file.write(zstd.ZstdCompressor().compress(data))
+        os.replace(partial, filename)
+
+    def __contains__(self, pk: str) -> bool:
+        return pk in self.oois or pk in self.origins
+
+    def grep(self, pattern: str) -> Iterator[str]:
+        regex = re.compile(pattern)
+        return (pk for pk in self.oois.keys() | self.origins if regex.search(pk))
+
+    def show(self, pk: str) -> dict[str, Any]:
+        chunks: dict[tuple[str, int], list[dict[str, Any]]] = {}
+
+        def record(section: str, chunk: int, line: int) -> dict[str, Any]:
+            if (section, chunk) not in chunks:
+                chunks[section, chunk] = self.reader.chunk(section, chunk)
+            return chunks[section, chunk][line]
+
+        found: dict[str, Any] = {"primary_key": pk, "ooi": None}
+        if pk in self.oois:
+            found["ooi"] = record("oois", *unpack(self.oois[pk]))
+        for role in ("source_of", "result_of"):
+            found[role] = {name: [] for name in ORIGIN_SECTIONS}
+        for location in self.origins.get(pk, ()):
+            name = ORIGIN_SECTIONS[location >> 1 & 3]
+            found[("source_of", "result_of")[location & 1]][name].append(
+                record(name, *unpack(location >> 3))
+            )
+        return found
+
+
+def unpack(location: int) -> tuple[int, int]:
+    return location >> LINE_BITS, location & ((1 << LINE_BITS) - 1)
+
+
+def percentile(counts: Counter[int], q: float) -> int:
+    rank = q * (counts.total() - 1)
+    seen = 0
+    for value in sorted(counts):
+        seen += counts[value]
+        if seen > rank:
+            return value
+    return 0
+
+
+def stats(reader: DatamapReader) -> dict[str, Any]:
+    """Counts by OOI type and origin method, the fan-out of observations
+    and the depth of the OOI graph.
+
+    The graph has an edge from every observation source to its results
+    and from every OOI to the OOIs referencing it. Roots are the OOIs no
+    origin derives from another OOI; depth is the largest number of hops
+    from an OOI to its nearest root.
+    """
+
+    types: Counter[str] = Counter()
+    ids: dict[str, int] = {}
+    for obj in reader.records("oois"):
+        types[obj["object_type"]] += 1
+        ids[obj["primary_key"]] = len(ids)
+    oois = len(ids)
+    methods = {name: Counter() for name in ORIGIN_SECTIONS}
+    fanout: Counter[int] = Counter()
+    edges: dict[int, list[int]] = defaultdict(list)
+    derived: set[int] = set()
+    for name in ORIGIN_SECTIONS:
+        for origin in reader.records(name):
+            methods[name][origin["method"]] += 1
+            source = ids.setdefault(origin["source"], len(ids))
+            results = [ids.setdefault(pk, len(ids)) for pk in origin["result"]]
+            derived.update(result for result in results if result != source)
+            if name == "observations":
+                fanout[len(results)] += 1
+                edges[source].extend(results)
+    for obj in reader.records("oois"):
+        for reference in references(obj, ids):
+            edges[ids[reference]].append(ids[obj["primary_key"]])
+    roots = [i for i in range(oois) if i not in derived]
+    depth = 0
+    seen = set(roots)
+    level = roots
+    while level:
+        following = []
+        for source in level:
+            for target in edges.get(source, ()):
+                if target not in seen:
+                    seen.add(target)
+                    following.append(target)
+        if following:
+            depth += 1
+        level = following
+    buckets = Counter()
+    for size, count in fanout.items():
+        bucket = next((b for b in FANOUT_BUCKETS if size <= b), FANOUT_BUCKETS[-1] + 1)
+        buckets[bucket] += count
+    return {
+        "organisation": reader.organisation,
+        "oois": reader.count("oois"),
+        **{name: reader.count(name) for name in ORIGIN_SECTIONS},
+        "types": dict(types.most_common()),
+        "methods": {
+            name: dict(counts.most_common()) for name, counts in methods.items()
+        },
+        "fanout": {
+            "min": min(fanout, default=0),
+            "p50": percentile(fanout, 0.5),
+            "p90": percentile(fanout, 0.9),
+            "p99": percentile(fanout, 0.99),
+            "max": max(fanout, default=0),
+            "buckets": {
+                (f"<={b}" if b in FANOUT_BUCKETS else f">{FANOUT_BUCKETS[-1]}"): count
+                for b, count in sorted(buckets.items())
+            },
+        },
+        "depth": depth,
+        "roots": len(roots),
+        "reachable": sum(1 for i in seen if i < oois),
+    }
@@ -0,0 +1,61 @@
+import json
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+VERSION = 1
+
+
+class Interrupted(BaseException):
+    def __init__(self, signum: int):
+        super().__init__(signal.Signals(signum).name)
+        self.signum = signum
+
+
+@contextmanager
+def interruptible(*signals: signal.Signals) -> Iterator[None]:
+    """Raise `Interrupted` on the given signals so that cleanup runs."""
+
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def handler(signum: int, frame: Any):
+        raise Interrupted(signum)
+
+    previous = {signum: signal.signal(signum, handler) for signum in signals}
+    try:
+        yield
+    finally:
+        for signum, action in previous.items():
+            signal.signal(signum, action)
+
+
+class Checkpoint:
+    def __init__(self, filename: str, interval: float = 30.0):
+        self.filename = filename
+        self.interval = interval
+        self.saved = 0
+        self._last = time.monotonic()
+
+    def due(self) -> bool:
+        return time.monotonic() - self._last >= self.interval
+
+    def save(self, state: dict[str, Any]):
+        partial = f"{self.filename}.partial"
+        with open(partial, "w") as file:
+            json.dump({"version": VERSION, "time": time.time(), **state}, file)
+        os.replace(partial, self.filename)
+        self.saved += 1
+        self._last = time.monotonic()
+
+    @staticmethod
+    def load(filename: str) -> dict[str, Any]:
+        with open(filename) as file:
+            state = json.load(file)
+        if state.get("version") != VERSION:
+            raise ValueError(f"unsupported checkpoint version in {filename}")
+        return state
@@ -0,0 +1,207 @@
+import asyncio
+import random
+import time
+from typing import Any, Callable
+
+from compact import CompactDatamap
+from convergence import Convergence
+from engine import Call, Pipeline, Report, call, submit_pipelined
+from failures import RequestFailed
+from octopoes_client import AsyncOctopoesClient, OctopoesClient
+from queue_monitor import QueueMonitor
+
+
+def origin_id(origin: dict[str, Any]) -> str:
+    return "|".join(
+        str(origin[key]) for key in ("origin_type", "method", "source_method", "source")
+    )
+
+
+def settle(
+    client: OctopoesClient,
+    monitor: QueueMonitor,
+    convergence: Convergence,
+    count: int,
+    report: Report,
+) -> int:
+    # probe at least once, so the count reflects the server even when the
+    # convergence is already quiet
+    while True:
+        convergence.sleep()
+        report("scan_profiles_recalculate", call(client, "scan_profiles_recalculate"))
+        probe = call(client, "count_objects")
+        if isinstance(probe, RequestFailed):
+            # an idle round, so a server that keeps failing cannot stall churn
+            report("count_objects", probe)
+            convergence.observe(False)
+        else:
+            convergence.observe(probe != count)
+            count = probe
+        if convergence.quiet and monitor.messages <= 0:
+            return count
+
+
+class Churn:
+    """Retract a share of the observations and delete a share of the OOIs,
+    then restore them.
+
+    Restoring resubmits the declarations of deleted declared OOIs and the
+    observations of every source downstream of what was removed, in
+    dependency order through a `Pipeline`.
+    """
+
+    def __init__(
+        self,
+        datamap: CompactDatamap,
+        share: float,
+        calls: Callable[[str], list[Call]],
+        page_size: int = 1000,
+        seed: int | None = None,
+    ):
+        self.datamap = datamap
+        self.share = share
+        self.calls = calls
+        self.page_size = page_size
+        self.cycles: list[dict[str, Any]] = []
+        self._rng = random.Random(seed)
+        self._declared = set(datamap.sources("declarations"))
+        self._references = list(datamap)
+
+    def sample(self) -> tuple[list[int], list[str]]:
+        count = self.datamap.count("observations")
+        retracted = self._rng.sample(range(count), round(self.share * count))
+        deleted = self._rng.sample(
+            self._references, round(self.share * len(self._references))
+        )
+        return sorted(retracted), deleted
+
+    def affected(self, retracted: list[int], deleted: list[str]) -> set[str]:
+        table = self.datamap.tables["observations"]
+        index = table.index()
+
+        def results(i: int):
+            return table.results[table.offsets[i] : table.offsets[i + 1]]
+
+        gone = {self.datamap.ids[pk] for pk in deleted}
+        for i in retracted:
+            gone.update(results(i))
+        stack = list(gone)
+        while stack:
+            for i in index.get(stack.pop(), ()):
+                for result in results(i):
+                    if result not in gone:
+                        gone.add(result)
+                        stack.append(result)
+        sources = {table.sources[i] for i in retracted} | (gone & index.keys())
+        sources.update(
+            table.sources[i]
+            for i in range(len(table))
+            if not gone.isdisjoint(results(i))
+        )
+        return {self.datamap.keys[source] for source in sources}
+
+    def retract(self, client: OctopoesClient, retracted: list[int], report: Report):
+        for i in retracted:
+            origin = self.datamap.origin("observations", i)
+            report("delete_origin", call(client, "delete_origin", origin_id(origin)))
+
+    def delete(self, client: OctopoesClient, deleted: list[str], report: Report):
+        for i in range(0, len(deleted), self.page_size):
+            chunk = deleted[i : i + self.page_size]
+            report("delete_many", call(client, "delete_many", chunk))
+
+    def restore(
+        self,
+        client: OctopoesClient,
+        aclient: AsyncOctopoesClient,
+        runner: asyncio.Runner,
+        deleted: list[str],
+        sources: set[str],
+        concurrency: int,
+        report: Report,
+        convergence: Convergence,
+    ) -> int:
+        declared = [pk for pk in deleted if pk in self._declared]
+        if declared:
+            objects = [self.datamap.ooi(pk) for pk in declared]
+            report(
+                "save_many_declarations",
+                call(
+                    client,
+                    "save_many_declarations",
+                    [{"ooi": obj} for obj in objects],
+                ),
+            )
+            report(
+                "save_many_scan_profile",
+                call(
+                    client,
+                    "save_many_scan_profile",
+                    [obj["scan_profile"] for obj in objects],
+                ),
+            )
+        pipeline = Pipeline(sources, self.calls, self.page_size)
+        return len(declared) + runner.run(
+            submit_pipelined(aclient, pipeline, concurrency, report, convergence)
+        )
+
+    def cycle(
+        self,
+        client: OctopoesClient,
+        aclient: AsyncOctopoesClient,
+        runner: asyncio.Runner,
+        monitor: QueueMonitor,
+        concurrency: int,
+        report: Report,
+        convergence: Callable[[], Convergence],
+    ) -> dict[str, Any]:
+        before = call(client, "count_objects")
+        if isinstance(before, RequestFailed):
+            report("count_objects", before)
+            before = len(self.datamap)
+        retracted, deleted = self.sample()
+        sources = self.affected(retracted, deleted)
+        begin = time.perf_counter()
+        removal = convergence()
+        self.retract(client, retracted, report)
+        self.delete(client, deleted, report)
+        requests = time.perf_counter() - begin
+        trough = settle(client, monitor, removal, before, report)
+        restoration = convergence()
+        restored = self.restore(
+            client,
+            aclient,
+            runner,
+            deleted,
+            sources,
+            concurrency,
+            report,
+            restoration,
+        )
+        settled = convergence()
+        after = settle(client, monitor, settled, trough, report)
+        restore_time = (
+            max(restoration.last_change, settled.last_change) - restoration.start
+        )
+        record = {
+            "retracted": len(retracted),
+            "deleted": len(deleted),
+            "resubmitted": restored,
+            "objects": before,
+            "trough": trough,
+            "restored": after,
+            "request_time": requests,
+            "cascade_time": removal.quiescence_time,
+            "restore_time": restore_time,
+        }
+        self.cycles.append(record)
+        return record
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "share": self.share,
+            "cycles": self.cycles,
+            "restored": all(
+                cycle["restored"] == cycle["objects"] for cycle in self.cycles
+            ),
+        }
@@ -0,0 +1,236 @@
+import json
+from array import array
+from collections import defaultdict
+from typing import Any, Iterable, Iterator
+
+import zstandard as zstd
+from kat import DatamapReader
+from multiplier import Multiplier
+
+ORIGINS = ("affirmations", "declarations", "observations")
+SAMPLES = 4096
+DICTIONARY_SIZE = 1 << 16
+
+
+def references(obj: dict[str, Any], catalog: dict[str, Any]) -> set[str]:
+    found = set()
+    stack = [value for key, value in obj.items() if key != "primary_key"]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            if value in catalog and value != obj["primary_key"]:
+                found.add(value)
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return found
+
+
+class Strings:
+    __slots__ = ("values", "ids")
+
+    def __init__(self):
+        self.values: list[str | None] = []
+        self.ids: dict[str | None, int] = {}
+
+    def intern(self, value: str | None) -> int:
+        i = self.ids.get(value)
+        if i is None:
+            i = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+
+class OriginTable:
+    __slots__ = (
+        "origin_type",
+        "sources",
+        "offsets",
+        "results",
+        "methods",
+        "source_methods",
+        "task_ids",
+        "_index",
+    )
+
+    def __init__(self, origin_type: str):
+        self.origin_type = origin_type
+        self.sources = array("I")
+        self.offsets = array("Q", [0])
+        self.results = array("I")
+        self.methods = array("I")
+        self.source_methods = array("I")
+        self.task_ids: list[str | None] = []
+        self._index: dict[int, array] | None = None
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def index(self) -> dict[int, array]:
+        if self._index is None:
+            index = defaultdict(lambda: array("I"))
+            for i, source in enumerate(self.sources):
+                index[source].append(i)
+            self._index = dict(index)
+        return self._index
+
+
+class CompactDatamap:
+    """Datamap with interned primary keys.
+
+    Every primary key is stored once and referred to by an integer id.
+    Origins live in array-backed tables (source id, result id ranges,
+    interned methods). OOIs are kept as compact JSON, compressed with a
+    zstd dictionary trained on the first SAMPLES objects, and are only
+    decoded when a request is built.
+    """
+
+    def __init__(self, organisation: str):
+        self.organisation = organisation
+        self.keys: list[str] = []
+        self.ids: dict[str, int] = {}
+        self.strings = Strings()
+        self._oois: list[bytes | None] = []
+        self._count = 0
+        self._pending: list[int] = []
+        self._compressor: zstd.ZstdCompressor | None = None
+        self._decompressor: zstd.ZstdDecompressor | None = None
+        self.tables = {section: OriginTable(section[:-1]) for section in ORIGINS}
+
+    @classmethod
+    def from_reader(
+        cls, reader: DatamapReader, multiplier: int = 1
+    ) -> "CompactDatamap":
+        datamap = cls(reader.organisation)
+        if multiplier > 1:
+            expanded = Multiplier(reader.records, multiplier)
+            datamap.extend(expanded.oois(), expanded.origins)
+        else:
+            datamap.extend(reader.records("oois"), reader.records)
+        return datamap
+
+    def extend(self, oois: Iterable[dict[str, Any]], origins):
+        for obj in oois:
+            self.add_ooi(obj)
+        for section in ORIGINS:
+            for origin in origins(section):
+                self.add_origin(section, origin)
+        self.train()
+
+    def train(self):
+        if self._compressor is not None or not self._pending:
+            return
+        try:
+            dictionary = zstd.train_dictionary(
+                DICTIONARY_SIZE, [self._oois[i] for i in self._pending]
+            )
+        except zstd.ZstdError:
+            dictionary = None
+        self._compressor = zstd.ZstdCompressor(dict_data=dictionary)
+        self._decompressor = zstd.ZstdDecompressor(dict_data=dictionary)
+        for i in self._pending:
+            self._oois[i] = self._compress(self._oois[i])
+        self._pending.clear()
+
+    def _compress(self, data: bytes) -> bytes:
+        # zstd hands back a buffer sized for the worst case; copy it down
+        return bytes(memoryview(self._compressor.compress(data)))
+
+    def intern(self, pk: str) -> int:
+        i = self.ids.get(pk)
+        if i is None:
+            i = self.ids[pk] = len(self.keys)
+            self.keys.append(pk)
+            self._oois.append(None)
+        return i
+
+    def add_ooi(self, obj: dict[str, Any]):
+        i = self.intern(obj["primary_key"])
+        if self._oois[i] is None:
+            self._count += 1
+        data = json.dumps(obj, separators=(",", ":")).encode()
+        if self._compressor is not None:
+            self._oois[i] = self._compress(data)
+            return
+        self._oois[i] = data
+        self._pending.append(i)
+        if len(self._pending) >= SAMPLES:
+            self.train()
+
+    def add_origin(self, section: str, origin: dict[str, Any]):
+        table = self.tables[section]
+        table.sources.append(self.intern(origin["source"]))
+        table.results.extend(self.intern(pk) for pk in origin["result"])
+        table.offsets.append(len(table.results))
+        table.methods.append(self.strings.intern(origin.get("method")))
+        table.source_methods.append(self.strings.intern(origin.get("source_method")))
+        table.task_ids.append(origin.get("task_id"))
+        table._index = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, pk: str) -> bool:
+        i = self.ids.get(pk)
+        return i is not None and self._oois[i] is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (pk for pk, data in zip(self.keys, self._oois) if data is not None)
+
+    def count(self, section: str) -> int:
+        return len(self.tables[section])
+
+    def ooi(self, pk: str) -> dict[str, Any]:
+        return self._ooi(self.ids[pk])
+
+    def _ooi(self, i: int) -> dict[str, Any]:
+        self.train()
+        if self._decompressor is None:
+            return json.loads(self._oois[i])
+        return json.loads(self._decompressor.decompress(self._oois[i]))
+
+    def origin(self, section: str, i: int) -> dict[str, Any]:
+        table = self.tables[section]
+        return {
+            "origin_type": table.origin_type,
+            "method": self.strings.values[table.methods[i]],
+            "source": self.keys[table.sources[i]],
+            "source_method": self.strings.values[table.source_methods[i]],
+            "result": [
+                self.keys[r]
+                for r in table.results[table.offsets[i] : table.offsets[i + 1]]
+            ],
+            "task_id": table.task_ids[i],
+        }
+
+    def origins(self, section: str) -> Iterator[dict[str, Any]]:
+        return (self.origin(section, i) for i in range(self.count(section)))
+
+    def sources(self, section: str) -> Iterator[str]:
+        return (self.keys[source] for source in self.tables[section].index())
+
+    def observations(self, pk: str) -> list[dict[str, Any]]:
+        table = self.tables["observations"]
+        payloads = []
+        for i in table.index().get(self.ids.get(pk, -1), ()):
+            origin = self.origin("observations", i)
+            origin["result"] = [
+                self._ooi(r)
+                for r in table.results[table.offsets[i] : table.offsets[i + 1]]
+            ]
+            payloads.append(origin)
+        return payloads
+
+    def affirmations(self, pk: str) -> list[dict[str, Any]]:
+        table = self.tables["affirmations"]
+        return [
+            {"ooi": self.ooi(pk)} for _ in table.index().get(self.ids.get(pk, -1), ())
+        ]
+
+    def materialize(self) -> dict[str, Any]:
+        return {
+            "organisation": self.organisation,
+            "oois": {pk: self.ooi(pk) for pk in self},
+            **{section: list(self.origins(section)) for section in ORIGINS},
+        }
@@ -0,0 +1,54 @@
+import random
+import time
+
+
+class Convergence:
+    def __init__(
+        self,
+        threshold: int,
+        delay: float = 0.0,
+        minimum: float = 0.1,
+        maximum: float = 5.0,
+        factor: float = 2.0,
+        jitter: float = 0.1,
+        seed: int | None = None,
+    ):
+        self.threshold = threshold
+        self.base = delay
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.jitter = jitter
+        self.delay = delay
+        self.idle = 0
+        self.start = time.perf_counter()
+        self.last_change = self.start
+        self._random = random.Random(seed)
+
+    @property
+    def quiet(self) -> bool:
+        return self.idle >= self.threshold
+
+    @property
+    def settling(self) -> bool:
+        return self.idle + 1 >= self.threshold
+
+    @property
+    def quiescence_time(self) -> float:
+        return self.last_change - self.start
+
+    def observe(self, changed: bool):
+        if changed:
+            self.idle = 0
+            self.delay = self.base
+            self.last_change = time.perf_counter()
+        else:
+            self.idle += 1
+            self.delay = min(self.maximum, max(self.delay * self.factor, self.minimum))
+
+    def interval(self) -> float:
+        jitter = self._random.uniform(-self.jitter, self.jitter)
+        return max(0.0, self.delay * (1 + jitter))
+
+    def sleep(self):
+        time.sleep(self.interval())
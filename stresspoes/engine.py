@@ -0,0 +1,234 @@
+import asyncio
+import random
+import time
+from typing import Any, Callable, Iterable
+
+from convergence import Convergence
+from failures import RequestFailed
+from metrics import Histogram
+from octopoes_client import AsyncOctopoesClient, OctopoesClient, OriginBatcher
+from pydantic import JsonValue
+
+Call = tuple[str, dict[str, Any]]
+Report = Callable[[str, JsonValue | RequestFailed], None]
+
+
+def call(client: OctopoesClient, method: str, *args: Any) -> JsonValue | RequestFailed:
+    try:
+        return getattr(client, method)(*args)
+    except RequestFailed as e:
+        return e
+
+
+async def acall(
+    client: AsyncOctopoesClient, method: str, *args: Any
+) -> JsonValue | RequestFailed:
+    try:
+        return await getattr(client, method)(*args)
+    except RequestFailed as e:
+        return e
+
+
+def submit(client: OctopoesClient, calls: Iterable[Call], report: Report) -> int:
+    count = 0
+    for method, payload in calls:
+        report(method, call(client, method, payload))
+        count += 1
+    return count
+
+
+def submit_batched(batcher: OriginBatcher, calls: Iterable[Call]) -> int:
+    count = 0
+    for method, payload in calls:
+        batcher.add(method, payload)
+        count += 1
+    batcher.flush()
+    return count
+
+
+async def submit_concurrently(
+    client: AsyncOctopoesClient,
+    calls: Iterable[Call],
+    concurrency: int,
+    report: Report,
+) -> int:
+    queue: asyncio.Queue[Call | None] = asyncio.Queue(maxsize=concurrency)
+
+    async def worker():
+        while (call := await queue.get()) is not None:
+            method, payload = call
+            report(method, await acall(client, method, payload))
+
+    count = 0
+    async with asyncio.TaskGroup() as tg:
+        for _ in range(concurrency):
+            tg.create_task(worker())
+        for call in calls:
+            await queue.put(call)
+            count += 1
+        for _ in range(concurrency):
+            await queue.put(None)
+    return count
+
+
+class OpenLoop:
+    def __init__(
+        self, rate: float, arrivals: str = "constant", seed: int | None = None
+    ):
+        self.rate = rate
+        self.arrivals = arrivals
+        self.random = random.Random(seed)
+        self.latency = Histogram()
+        self.lag = Histogram()
+        self.behind = 0.0
+
+    def interval(self) -> float:
+        if self.arrivals == "poisson":
+            return self.random.expovariate(self.rate)
+        return 1 / self.rate
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "rate": self.rate,
+            "arrivals": self.arrivals,
+            "latency": self.latency.summary(),
+            "lag": self.lag.summary(),
+            "behind": self.behind,
+        }
+
+
+async def submit_open_loop(
+    client: AsyncOctopoesClient,
+    calls: Iterable[Call],
+    schedule: OpenLoop,
+    report: Report,
+) -> tuple[int, float]:
+    loop = asyncio.get_running_loop()
+
+    async def send(method: str, payload: dict[str, Any], intended: float):
+        schedule.lag.record(int((loop.time() - intended) * 1e9))
+        res = await acall(client, method, payload)
+        schedule.latency.record(int((loop.time() - intended) * 1e9))
+        report(method, res)
+
+    count = 0
+    # how late the last call was dispatched, not waiting for its response
+    behind = 0.0
+    intended = loop.time()
+    async with asyncio.TaskGroup() as tg:
+        for method, payload in calls:
+            delay = intended - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            behind = max(0.0, loop.time() - intended)
+            tg.create_task(send(method, payload, intended))
+            intended += schedule.interval()
+            count += 1
+    schedule.behind = max(schedule.behind, behind)
+    return count, behind
+
+
+class Pipeline:
+    def __init__(
+        self,
+        sources: Iterable[str],
+        calls: Callable[[str], list[Call]],
+        check_size: int = 1000,
+    ):
+        self.calls = calls
+        self.check_size = check_size
+        self.waiting = set(sources)
+        self.sources = len(self.waiting)
+        self.submitted: set[str] = set()
+        self.produced: dict[str, int] = {}
+        # time from a harness write returning to its results being loadable
+        self.visibility = Histogram()
+        self.checks = 0
+        self.sweeps = 0
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "sources": self.sources,
+            "submitted": len(self.submitted),
+            "unresolved": len(self.waiting),
+            "checks": self.checks,
+            "sweeps": self.sweeps,
+            "visibility": self.visibility.summary(),
+        }
+
+
+async def submit_pipelined(
+    client: AsyncOctopoesClient,
+    pipeline: Pipeline,
+    concurrency: int,
+    report: Report,
+    convergence: Convergence,
+) -> int:
+    queue: asyncio.Queue[Call | None] = asyncio.Queue()
+    candidates: set[str] = set()
+    completed = asyncio.Event()
+    inflight = 0
+    count = 0
+
+    async def worker():
+        nonlocal inflight, count
+        while (call := await queue.get()) is not None:
+            method, payload = call
+            report(method, await acall(client, method, payload))
+            done = time.perf_counter_ns()
+            for obj in payload.get("result", ()):
+                pk = obj["primary_key"]
+                pipeline.produced.setdefault(pk, done)
+                if pk in pipeline.waiting:
+                    candidates.add(pk)
+            inflight -= 1
+            count += 1
+            completed.set()
+
+    async def check(references: list[str]) -> bool:
+        nonlocal inflight
+        found = await acall(client, "load_bulk", references)
+        pipeline.checks += 1
+        if isinstance(found, RequestFailed):
+            report("load_bulk", found)
+            return False
+        now = time.perf_counter_ns()
+        for pk in references:
+            if pk not in found or pk not in pipeline.waiting:
+                continue
+            pipeline.waiting.discard(pk)
+            pipeline.submitted.add(pk)
+            if pk in pipeline.produced:
+                pipeline.visibility.record(now - pipeline.produced[pk])
+            for call in pipeline.calls(pk):
+                inflight += 1
+                queue.put_nowait(call)
+        if found:
+            convergence.observe(True)
+        return bool(found)
+
+    async with asyncio.TaskGroup() as tg:
+        for _ in range(concurrency):
+            tg.create_task(worker())
+        while pipeline.waiting and not convergence.quiet:
+            if candidates:
+                batch = [
+                    candidates.pop()
+                    for _ in range(min(len(candidates), pipeline.check_size))
+                ]
+                await check(batch)
+            elif inflight:
+                completed.clear()
+                await completed.wait()
+            else:
+                pipeline.sweeps += 1
+                waiting = sorted(pipeline.waiting)
+                progress = False
+                for i in range(0, len(waiting), pipeline.check_size):
+                    progress |= await check(waiting[i : i + pipeline.check_size])
+                if not progress:
+                    convergence.observe(False)
+                    await asyncio.sleep(convergence.interval())
+        for _ in range(concurrency):
+            await queue.put(None)
+    return count
@@ -0,0 +1,148 @@
+import random
+import threading
+from typing import Any
+
+import httpx
+
+RETRYABLE = frozenset({"throttled", "server", "unavailable", "timeout", "connection"})
+DETAIL = 200
+
+
+def classify_status(status: int) -> str | None:
+    if status < 400:
+        return None
+    if status == 429:
+        return "throttled"
+    if status in (502, 503, 504):
+        return "unavailable"
+    if status >= 500:
+        return "server"
+    return {404: "not_found", 409: "conflict", 422: "invalid"}.get(status, "client")
+
+
+def classify_error(error: Exception) -> str:
+    if isinstance(error, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(error, httpx.TransportError):
+        return "connection"
+    if isinstance(error, ValueError):
+        return "decode"
+    return "http"
+
+
+class RequestFailed(Exception):
+    def __init__(self, endpoint: str, category: str, status: int, detail: str):
+        super().__init__(f"{endpoint}: {category} ({status}) {detail}")
+        self.endpoint = endpoint
+        self.category = category
+        self.status = status
+        self.detail = detail[:DETAIL]
+
+    @property
+    def retryable(self) -> bool:
+        return self.category in RETRYABLE
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        attempts: int = 4,
+        base: float = 0.1,
+        cap: float = 2.0,
+        jitter: float = 0.5,
+        seed: int | None = None,
+    ):
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+        self.jitter = jitter
+        self._random = random.Random(seed)
+
+    def delay(self, attempt: int, retry_after: str | None = None) -> float:
+        if retry_after is not None:
+            try:
+                return min(self.cap, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+        delay = min(self.cap, self.base * 2**attempt)
+        return delay * (1 - self._random.uniform(0, self.jitter))
+
+
+class Failures:
+    """Failure and retry counts per endpoint and category.
+
+    Keeps the first detail seen for every pair, so a misbehaving server
+    costs a dictionary increment per request rather than a log line.
+    """
+
+    def __init__(self):
+        self.counts: dict[tuple[str, str], int] = {}
+        self.retries: dict[tuple[str, str], int] = {}
+        self.details: dict[tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {
+            "counts": self.counts,
+            "retries": self.retries,
+            "details": self.details,
+        }
+
+    def __setstate__(self, state: dict[str, Any]):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __call__(self, method: str, res: Any):
+        if isinstance(res, RequestFailed):
+            self.record(res.endpoint, res.category, res.detail)
+        elif res is not None:
+            self.record(method, "rejected", str(res)[:DETAIL])
+
+    def __bool__(self) -> bool:
+        return bool(self.counts or self.retries)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def record(self, endpoint: str, category: str, detail: str = ""):
+        key = endpoint, category
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+            self.details.setdefault(key, detail)
+
+    def retry(self, endpoint: str, category: str, detail: str = ""):
+        key = endpoint, category
+        with self._lock:
+            self.retries[key] = self.retries.get(key, 0) + 1
+            self.details.setdefault(key, detail)
+
+    def merge(self, other: "Failures"):
+        with self._lock:
+            for key, count in other.counts.items():
+                self.counts[key] = self.counts.get(key, 0) + count
+            for key, count in other.retries.items():
+                self.retries[key] = self.retries.get(key, 0) + count
+            for key, detail in other.details.items():
+                self.details.setdefault(key, detail)
+
+    def summary(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "endpoint": endpoint,
+                    "category": category,
+                    "failures": self.counts.get((endpoint, category), 0),
+                    "retries": self.retries.get((endpoint, category), 0),
+                    "detail": self.details.get((endpoint, category), ""),
+                }
+                for endpoint, category in sorted(self.counts.keys() | self.retries)
+            ]
+
+    def table(self) -> str:
+        lines = [f"{"endpoint":<40} {"category":<12} {"failures":>8} {"retries":>8}"]
+        for row in self.summary():
+            lines.append(
+                f"{row["endpoint"]:<40} {row["category"]:<12} {row["failures"]:>8} {row["retries"]:>8}  {row["detail"][:60]}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,485 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable
+
+import httpx
+
+from compact import references
+
+Distribution = Callable[[random.Random], float]
+
+
+def parse_latency(spec: str) -> Distribution:
+    name, _, args = spec.partition(":")
+    try:
+        if not args:
+            value = float(name) / 1e3
+            return lambda rng: value
+        params = [float(arg) for arg in args.split(",")]
+    except ValueError:
+        params = []
+    match name, params:
+        case "const", [value]:
+            return lambda rng: value / 1e3
+        case "uniform", [low, high]:
+            return lambda rng: rng.uniform(low, high) / 1e3
+        case "exp", [mean] if mean > 0:
+            return lambda rng: rng.expovariate(1e3 / mean)
+        case "normal", [mean, sigma]:
+            return lambda rng: max(0.0, rng.gauss(mean, sigma)) / 1e3
+        case "lognormal", [median, sigma]:
+            return lambda rng: median * rng.lognormvariate(0.0, sigma) / 1e3
+    raise ValueError(f"invalid latency distribution: {spec}")
+
+
+def respond(status: int, payload: Any) -> httpx.Response:
+    return httpx.Response(
+        status,
+        content=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+
+
+class Node:
+    def __init__(self):
+        self.oois: dict[str, dict[str, Any]] = {}
+        self.origins: dict[str, dict[str, Any]] = {}
+        self.scan_profiles: dict[str, dict[str, Any]] = {}
+        self.events: deque[str] = deque()
+        self.primed = False
+        self._listing: list[dict[str, Any]] | None = None
+
+    def listing(self) -> list[dict[str, Any]]:
+        if self._listing is None:
+            self._listing = sorted(
+                self.oois.values(),
+                key=lambda obj: (obj["object_type"], obj["primary_key"]),
+            )
+        return self._listing
+
+    def upsert(self, obj: dict[str, Any]):
+        pk = obj["primary_key"]
+        if pk in self.scan_profiles:
+            obj = {**obj, "scan_profile": self.scan_profiles[pk]}
+        if self.oois.get(pk) != obj:
+            self.oois[pk] = obj
+            self.events.append(pk)
+            self._listing = None
+
+    def save_origin(
+        self, origin: dict[str, Any], results: list[dict[str, Any]]
+    ) -> dict[str, Any]:
+        origin = {
+            "origin_type": origin.get("origin_type", "observation"),
+            "method": origin.get("method", ""),
+            "source": origin["source"],
+            "source_method": origin.get("source_method"),
+            "result": [obj["primary_key"] for obj in results],
+            "task_id": origin.get("task_id"),
+        }
+        origin_id = "|".join(
+            str(origin[key])
+            for key in ("origin_type", "method", "source_method", "source")
+        )
+        previous = self.origins.get(origin_id)
+        self.origins[origin_id] = origin
+        for obj in results:
+            self.upsert(obj)
+        if previous is not None and set(previous["result"]) - set(origin["result"]):
+            self.collect()
+        return origin
+
+    def delete(self, references: list[str]):
+        for pk in references:
+            if self.oois.pop(pk, None) is not None:
+                self.events.append(pk)
+        self.collect()
+
+    def delete_origin(self, origin_id: str):
+        if self.origins.pop(origin_id, None) is not None:
+            self.collect()
+
+    def collect(self):
+        while True:
+            self.origins = {
+                origin_id: origin
+                for origin_id, origin in self.origins.items()
+                if origin["source"] in self.oois
+            }
+            backed = {pk for origin in self.origins.values() for pk in origin["result"]}
+            orphans = [pk for pk in self.oois if pk not in backed]
+            if not orphans:
+                break
+            for pk in orphans:
+                del self.oois[pk]
+            self.events.extend(orphans)
+        self._listing = None
+
+
+class FakeOctopoes:
+    """In-process stand-in for Octopoes and the RabbitMQ management API.
+
+    Saved origins are stored as-is, so the objects of a saved observation
+    appear only once it is submitted. Every new or changed object is queued
+    as an event. Processing an event applies one inference rule against the
+    datamap catalog: objects the capture cannot reach through declarations
+    and observations are inferred once all of their references are present
+    (objects without references once the first object is). A fraction
+    `error_rate` of the writes fails with a 500. Up to `throughput` events
+    are processed per request (0: all), so the queue depth is observable
+    via `/api/queues`.
+    """
+
+    def __init__(
+        self,
+        datamap: dict[str, Any] | None = None,
+        latency: str = "0",
+        error_rate: float = 0.0,
+        throughput: int = 0,
+        seed: int | None = None,
+    ):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.throughput = throughput
+        self.nodes: dict[str, Node] = defaultdict(Node)
+        self.inferable: dict[str, dict[str, Any]] = {}
+        self.references: dict[str, list[str]] = {}
+        self.referrers: dict[str, list[str]] = defaultdict(list)
+        self.constants: list[str] = []
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        if datamap is not None:
+            self.catalog(datamap)
+        self.routes: dict[tuple[str, str], Callable[..., Any]] = {
+            ("GET", "/health"): self.health,
+            ("GET", "/objects"): self.objects,
+            ("GET", "/query"): lambda node, request: [],
+            ("GET", "/query_many"): lambda node, request: [],
+            ("POST", "/objects/load_bulk"): self.load_bulk,
+            ("GET", "/object"): self.object,
+            ("GET", "/object-history"): lambda node, request: [],
+            ("GET", "/objects/random"): self.random,
+            ("DELETE", "/"): self.delete,
+            ("POST", "/objects/delete_many"): self.delete_many,
+            ("GET", "/tree"): self.tree,
+            ("GET", "/origins"): self.origins,
+            ("DELETE", "/origins"): self.delete_origin,
+            ("GET", "/origin_parameters"): lambda node, request: [],
+            ("POST", "/observations"): self.save_observation,
+            ("POST", "/declarations"): self.save_declaration,
+            ("POST", "/declarations/save_many"): self.save_many_declarations,
+            ("POST", "/affirmations"): self.save_affirmation,
+            ("GET", "/findings"): self.findings,
+            ("GET", "/findings/count_by_severity"): self.count_by_severity,
+            ("POST", "/bits/recalculate"): self.bits_recalculate,
+            ("GET", "/scan_profiles"): self.scan_profiles,
+            ("PUT", "/scan_profiles"): self.save_scan_profile,
+            ("POST", "/scan_profiles/save_many"): self.save_many_scan_profile,
+            ("GET", "/scan_profiles/recalculate"): lambda node, request: None,
+        }
+
+    def catalog(self, datamap: dict[str, Any]):
+        oois = datamap["oois"]
+        self.references = {
+            pk: sorted(references(obj, oois)) for pk, obj in oois.items()
+        }
+        self.referrers.clear()
+        for pk, refs in self.references.items():
+            for reference in refs:
+                self.referrers[reference].append(pk)
+        observed: dict[str, list[str]] = defaultdict(list)
+        for origin in datamap["observations"]:
+            observed[origin["source"]].extend(origin["result"])
+        # Replay the datamap: objects are reached through declarations and
+        # observations, and objects inferred in the capture are not recorded
+        # as such. Whenever the replay stalls, the first unreached
+        # observation source (or failing that, every unreached object) whose
+        # references were reached is taken to be inferred.
+        reached: set[str] = set()
+        inferable: set[str] = set()
+        pending: deque[str] = deque()
+
+        def reach(pk: str):
+            if pk in oois and pk not in reached:
+                reached.add(pk)
+                pending.append(pk)
+
+        def resolved(pk: str) -> bool:
+            return all(ref in reached for ref in self.references[pk])
+
+        for origin in datamap["declarations"]:
+            reach(origin["source"])
+        while True:
+            while pending:
+                pk = pending.popleft()
+                for result in observed.get(pk, ()):
+                    reach(result)
+                for referrer in self.referrers.get(pk, ()):
+                    if referrer in inferable and resolved(referrer):
+                        reach(referrer)
+            stalled = [pk for pk in observed if pk not in reached and resolved(pk)][
+                :1
+            ] or [pk for pk in oois if pk not in reached and resolved(pk)]
+            if not stalled:
+                break
+            inferable.update(stalled)
+            for pk in stalled:
+                reach(pk)
+        self.inferable = {pk: oois[pk] for pk in oois if pk in inferable}
+        self.constants = [pk for pk in self.inferable if not self.references[pk]]
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def async_transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle_async)
+
+    def _delay(self) -> float:
+        with self._lock:
+            return self.latency(self._rng)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        time.sleep(self._delay())
+        return self.dispatch(request)
+
+    async def handle_async(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self._delay())
+        return self.dispatch(request)
+
+    async def __call__(self, scope: dict[str, Any], receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        request = httpx.Request(
+            scope["method"],
+            httpx.URL(path=scope["path"], query=scope["query_string"]),
+            headers=[(key.decode(), value.decode()) for key, value in scope["headers"]],
+            content=body,
+        )
+        response = await self.handle_async(request)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": response.headers.raw,
+            }
+        )
+        await send({"type": "http.response.body", "body": response.content})
+
+    def dispatch(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        with self._lock:
+            self.requests += 1
+            if path.startswith("/api/queues/"):
+                return self.queue()
+            if path == "/health":
+                return respond(200, self.health(None, request))
+            if (
+                request.method != "GET"
+                and self.error_rate
+                and self._rng.random() < self.error_rate
+            ):
+                return respond(500, {"status": "error", "message": "injected failure"})
+            organisation, _, rest = path[1:].partition("/")
+            if rest == "node":
+                if request.method == "POST":
+                    self.nodes[organisation] = Node()
+                else:
+                    self.nodes.pop(organisation, None)
+                return respond(200, None)
+            node = self.nodes[organisation]
+            route = self.routes.get((request.method, f"/{rest}"))
+            if route is None:
+                return respond(404, {"detail": "Not Found"})
+            self.process(node, self.throughput)
+            return respond(200, route(node, request))
+
+    def process(self, node: Node, limit: int = 0):
+        if not node.primed and node.events:
+            node.primed = True
+            for pk in self.constants:
+                self.infer(node, node.events[0], pk)
+        processed = 0
+        while node.events and (not limit or processed < limit):
+            pk = node.events.popleft()
+            processed += 1
+            if pk not in node.oois:
+                # inference recreates what it inferred while its references exist
+                if pk in self.inferable and node.oois:
+                    refs = self.references[pk]
+                    if all(ref in node.oois for ref in refs):
+                        self.infer(node, refs[0] if refs else next(iter(node.oois)), pk)
+                continue
+            for referrer in self.referrers.get(pk, ()):
+                if (
+                    referrer in self.inferable
+                    and referrer not in node.oois
+                    and all(ref in node.oois for ref in self.references[referrer])
+                ):
+                    self.infer(node, pk, referrer)
+        return processed
+
+    def infer(self, node: Node, source: str, pk: str):
+        # one inference origin per source, accumulating its results
+        previous = node.origins.get(f"inference|fake|None|{source}")
+        results = [] if previous is None else previous["result"]
+        node.save_origin(
+            {"origin_type": "inference", "method": "fake", "source": source},
+            [node.oois[ref] for ref in results if ref in node.oois]
+            + [self.inferable[pk]],
+        )
+
+    def queue(self) -> httpx.Response:
+        depth = sum(len(node.events) for node in self.nodes.values())
+        return respond(
+            200,
+            {
+                "messages": depth,
+                "messages_ready": depth,
+                "messages_unacknowledged": 0,
+                "consumers": 1,
+                "message_stats": {},
+            },
+        )
+
+    def health(self, node: Node | None, request: httpx.Request) -> Any:
+        return {"service": "octopoes", "healthy": True, "version": "fake"}
+
+    def objects(self, node: Node, request: httpx.Request) -> Any:
+        params = request.url.params
+        types = set(params.get_list("types")) - {"OOI"}
+        search = params.get("search_string")
+        items = [
+            obj
+            for obj in node.listing()
+            if (not types or obj["object_type"] in types)
+            and (search is None or search in obj["primary_key"])
+        ]
+        if params.get("asc_desc") == "desc":
+            items.reverse()
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", len(items)))
+        return {"count": len(items), "items": items[offset : offset + limit]}
+
+    def load_bulk(self, node: Node, request: httpx.Request) -> Any:
+        return {
+            pk: node.oois[pk] for pk in json.loads(request.content) if pk in node.oois
+        }
+
+    def object(self, node: Node, request: httpx.Request) -> Any:
+        return node.oois.get(request.url.params["reference"])
+
+    def random(self, node: Node, request: httpx.Request) -> Any:
+        amount = int(request.url.params.get("amount", 1))
+        return self._rng.sample(list(node.oois), min(amount, len(node.oois)))
+
+    def delete(self, node: Node, request: httpx.Request) -> Any:
+        node.delete([request.url.params["reference"]])
+
+    def delete_many(self, node: Node, request: httpx.Request) -> Any:
+        node.delete(json.loads(request.content))
+
+    def tree(self, node: Node, request: httpx.Request) -> Any:
+        reference = request.url.params["reference"]
+        return {
+            "root": {"reference": reference, "children": {}},
+            "store": (
+                {reference: node.oois[reference]} if reference in node.oois else {}
+            ),
+        }
+
+    def origins(self, node: Node, request: httpx.Request) -> Any:
+        params = request.url.params
+        methods = params.get_list("method")
+        result = params.get("result")
+        items = [
+            origin
+            for origin in node.origins.values()
+            if all(
+                params.get(key) in (None, origin[key])
+                for key in ("source", "origin_type", "task_id")
+            )
+            and (result is None or result in origin["result"])
+            and (not methods or origin["method"] in methods)
+        ]
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", len(items)))
+        return items[offset : offset + limit]
+
+    def delete_origin(self, node: Node, request: httpx.Request) -> Any:
+        node.delete_origin(request.url.params["origin_id"])
+
+    def save_observation(self, node: Node, request: httpx.Request) -> Any:
+        origin = json.loads(request.content)
+        node.save_origin(origin, origin["result"])
+
+    def save_declaration(self, node: Node, request: httpx.Request) -> Any:
+        self.declare(node, json.loads(request.content))
+
+    def save_many_declarations(self, node: Node, request: httpx.Request) -> Any:
+        for declaration in json.loads(request.content):
+            self.declare(node, declaration)
+
+    def declare(self, node: Node, declaration: dict[str, Any]):
+        ooi = declaration["ooi"]
+        node.save_origin(
+            {
+                "origin_type": "declaration",
+                "method": declaration.get("method") or "manual",
+                "source": ooi["primary_key"],
+                "task_id": declaration.get("task_id"),
+            },
+            [ooi],
+        )
+
+    def save_affirmation(self, node: Node, request: httpx.Request) -> Any:
+        ooi = json.loads(request.content)["ooi"]
+        if ooi["primary_key"] in node.oois:
+            node.save_origin(
+                {
+                    "origin_type": "affirmation",
+                    "method": ooi["object_type"],
+                    "source": ooi["primary_key"],
+                },
+                [ooi],
+            )
+
+    def findings(self, node: Node, request: httpx.Request) -> Any:
+        items = [obj for obj in node.listing() if obj["object_type"] == "Finding"]
+        return {"count": len(items), "items": items}
+
+    def count_by_severity(self, node: Node, request: httpx.Request) -> Any:
+        return {}
+
+    def bits_recalculate(self, node: Node, request: httpx.Request) -> Any:
+        return self.process(node)
+
+    def scan_profiles(self, node: Node, request: httpx.Request) -> Any:
+        profile_type = request.url.params.get("scan_profile_type")
+        return [
+            profile
+            for profile in node.scan_profiles.values()
+            if profile_type in (None, profile.get("scan_profile_type"))
+        ]
+
+    def save_scan_profile(self, node: Node, request: httpx.Request) -> Any:
+        self.profile(node, json.loads(request.content))
+
+    def save_many_scan_profile(self, node: Node, request: httpx.Request) -> Any:
+        for profile in json.loads(request.content):
+            self.profile(node, profile)
+
+    def profile(self, node: Node, profile: dict[str, Any]):
+        node.scan_profiles[profile["reference"]] = profile
+        if profile["reference"] in node.oois:
+            node.upsert(node.oois[profile["reference"]])
@@ -0,0 +1,214 @@
+import random
+import uuid
+from ipaddress import IPv4Address
+from typing import Any
+
+from kat import SECTIONS, DatamapWriter
+
+SERVICES = {
+    22: "ssh",
+    25: "smtp",
+    53: "domain",
+    80: "http",
+    443: "https",
+    3306: "mysql",
+    5432: "postgresql",
+    8080: "http-proxy",
+}
+
+
+def ooi(object_type: str, pk: str, level: int, profile: str, **fields: Any):
+    return {
+        "object_type": object_type,
+        "scan_profile": {
+            "scan_profile_type": profile,
+            "reference": pk,
+            "level": level,
+            "user_id": None,
+        },
+        "user_id": None,
+        "primary_key": pk,
+        **fields,
+    }
+
+
+class Generator:
+    def __init__(
+        self,
+        networks: int = 1,
+        hostnames: int = 10,
+        ips: int = 1,
+        ports: int = 3,
+        fanout: int = 2,
+        depth: int = 1,
+        affirmations: float = 0.0,
+        seed: int | None = None,
+    ):
+        self.networks = networks
+        self.hostnames = hostnames
+        self.ips = ips
+        self.ports = sorted(SERVICES)[:ports] + list(
+            range(10000, 10000 + max(0, ports - len(SERVICES)))
+        )
+        self.fanout = fanout
+        self.depth = depth
+        self.affirmations = affirmations
+        self.counts = {section: 0 for section in SECTIONS}
+        self._rng = random.Random(seed)
+        self._address = int(IPv4Address("10.0.0.0"))
+        self._writer: DatamapWriter | None = None
+        self._services: set[str] = set()
+
+    def task_id(self) -> str:
+        return str(uuid.UUID(int=self._rng.getrandbits(128), version=4))
+
+    def _ooi(self, obj: dict[str, Any]) -> str:
+        self._writer.add("oois", obj)
+        self.counts["oois"] += 1
+        return obj["primary_key"]
+
+    def _origin(
+        self,
+        origin_type: str,
+        method: str,
+        source_method: str,
+        source: str,
+        result: list[str],
+    ):
+        section = f"{origin_type}s"
+        self._writer.add(
+            section,
+            {
+                "origin_type": origin_type,
+                "method": method,
+                "source": source,
+                "source_method": source_method,
+                "result": result,
+                "task_id": self.task_id(),
+            },
+        )
+        self.counts[section] += 1
+
+    def _declare(self, obj: dict[str, Any]) -> str:
+        pk = self._ooi(obj)
+        self._origin("declaration", "kat_manual_ooi", "manual", pk, [pk])
+        return pk
+
+    def _observe(self, method: str, source_method: str, source: str, result: list[str]):
+        self._origin("observation", method, source_method, source, result)
+        if result and self._rng.random() < self.affirmations:
+            pk = self._rng.choice(result)
+            self._origin("affirmation", method, source_method, pk, [pk])
+
+    def write(self, writer: DatamapWriter) -> dict[str, int]:
+        self._writer = writer
+        for n in range(self.networks):
+            name = "internet" if n == 0 else f"internet-{n}"
+            network = self._declare(
+                ooi("Network", f"Network|{name}", 0, "empty", name=name)
+            )
+            for h in range(self.hostnames):
+                self._hostname(network, name, f"host{h}.net{n}.test", 0, True)
+        return self.counts
+
+    def _hostname(self, network: str, name: str, fqdn: str, level: int, root: bool):
+        obj = ooi(
+            "Hostname",
+            f"Hostname|{name}|{fqdn}",
+            2 if root else 1,
+            "declared" if root else "inherited",
+            network=network,
+            name=fqdn,
+            dns_zone=None,
+            registered_domain=None,
+        )
+        hostname = self._declare(obj) if root else self._ooi(obj)
+        result = []
+        addresses = []
+        for _ in range(self.ips):
+            value = str(IPv4Address(self._address))
+            self._address += 1
+            address = self._ooi(
+                ooi(
+                    "IPAddressV4",
+                    f"IPAddressV4|{name}|{value}",
+                    2,
+                    "inherited",
+                    address=value,
+                    network=network,
+                    netblock=None,
+                )
+            )
+            record = self._ooi(
+                ooi(
+                    "DNSARecord",
+                    f"DNSARecord|{name}|{fqdn}|{value}",
+                    2,
+                    "inherited",
+                    hostname=hostname,
+                    dns_record_type="A",
+                    value=value,
+                    ttl=3600,
+                    address=address,
+                )
+            )
+            resolved = self._ooi(
+                ooi(
+                    "ResolvedHostname",
+                    f"ResolvedHostname|{name}|{fqdn}|{name}|{value}",
+                    2,
+                    "inherited",
+                    hostname=hostname,
+                    address=address,
+                )
+            )
+            result += [address, record, resolved]
+            addresses.append((address, value))
+        children = []
+        if level < self.depth:
+            children = [f"sub{i}.{fqdn}" for i in range(self.fanout)]
+            result += [f"Hostname|{name}|{child}" for child in children]
+        for child in children:
+            self._hostname(network, name, child, level + 1, False)
+        self._observe("kat_dns_normalize", "dns-records", hostname, result)
+        for address, value in addresses:
+            self._ports(name, address, value)
+
+    def _ports(self, name: str, address: str, value: str):
+        result = []
+        for port in self.ports:
+            ip_port = self._ooi(
+                ooi(
+                    "IPPort",
+                    f"IPPort|{name}|{value}|tcp|{port}",
+                    2,
+                    "inherited",
+                    address=address,
+                    protocol="tcp",
+                    port=port,
+                    state="open",
+                )
+            )
+            label = SERVICES.get(port, f"unknown-{port}")
+            service = f"Service|{label}"
+            if service not in self._services:
+                self._services.add(service)
+                self._ooi(ooi("Service", service, 1, "inherited", name=label))
+            ip_service = self._ooi(
+                ooi(
+                    "IPService",
+                    f"IPService|{name}|{value}|tcp|{port}|{label}",
+                    2,
+                    "inherited",
+                    ip_port=ip_port,
+                    service=service,
+                )
+            )
+            result += [ip_port, service, ip_service]
+        if result:
+            self._observe("kat_nmap_normalize", "nmap", address, result)
+
+
+def generate(filename: str, organisation: str, **kwargs: Any) -> dict[str, int]:
+    with DatamapWriter(filename, organisation) as writer:
+        return Generator(**kwargs).write(writer)
@@ -0,0 +1,663 @@
+import asyncio
+import os
+import signal
+import random
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Iterable, Iterator
+
+from convergence import Convergence
+from engine import (
+    Call,
+    call,
+    OpenLoop,
+    Pipeline,
+    submit,
+    submit_batched,
+    submit_concurrently,
+    submit_open_loop,
+    submit_pipelined,
+)
+from failures import Failures, RequestFailed, RetryPolicy
+from fake_octopoes import FakeOctopoes
+from checkpoint import Checkpoint, interruptible
+from churn import Churn
+from compact import CompactDatamap
+from kat import CorruptDatamap, DatamapReader
+from metrics import Metrics
+from octopoes_client import AsyncOctopoesClient, AsyncPool, OctopoesClient, Pool
+from queue_monitor import QueueMonitor
+from reads import ReadLoad, parse_read_mix
+from results import Results, environment
+from snapshot import Diff, Snapshot
+from verify import Verification
+
+ORIGIN_SECTIONS = ("affirmations", "declarations", "observations")
+ORIGIN_TYPES = ("affirmation", "declaration", "observation", "inference", "nibblet")
+
+
+@dataclass
+class StressConfig:
+    url: str
+    organisation: str
+    filename: str = "datamap.kat"
+    dump: bool = False
+    noxterminate: bool = True
+    multiplier: int = 1
+    noaffirm: bool = True
+    threshold: int = 0xF
+    timeout: float = 0.0
+    backoff_min: float = 0.1
+    backoff_max: float = 1.0
+    jitter: float = 0.1
+    concurrency: int = 1
+    batch_size: int = 1
+    linger: float = 0.05
+    rate: float = 0.0
+    arrivals: str = "constant"
+    fingerprint: bool = True
+    latency: bool = False
+    latency_file: str | None = None
+    results_file: str | None = None
+    append_results: bool = False
+    page_size: int = 1000
+    prefetch: bool = False
+    rabbitmq_url: str = "http://localhost:15672"
+    rabbitmq_user: str | None = None
+    rabbitmq_password: str | None = None
+    vhost: str = "kat"
+    queue: str = "octopoes"
+    queue_interval: float = 1.0
+    queue_file: str | None = None
+    backend: str = "octopoes"
+    fake_latency: str = "0"
+    fake_error_rate: float = 0.0
+    fake_throughput: int = 0
+    pipeline: bool = False
+    bits: bool = False
+    read_mix: str = ""
+    readers: int = 1
+    read_sampling: str = "datamap"
+    churn: int = 0
+    churn_share: float = 0.1
+    max_connections: int = 100
+    max_keepalive: int = 20
+    keepalive_expiry: float = 5.0
+    http2: bool = False
+    retries: int = 3
+    retry_backoff: float = 0.1
+    retry_max: float = 2.0
+    verify_content: bool = False
+    checkpoint: str | None = None
+    checkpoint_interval: float = 30.0
+    resume: str | None = None
+    fresh: bool = False
+    label: str = ""
+
+
+def update_snapshot(
+    snapshot: Snapshot, client: OctopoesClient, page: tuple[int, bool]
+) -> Diff | RequestFailed:
+    # the snapshot only changes once the whole listing is read
+    try:
+        return snapshot.update(client.iter_objects(*page))
+    except RequestFailed as e:
+        return e
+
+
+def random_organisation(organisation: str) -> str:
+    return (
+        organisation
+        + f"-{"".join(chr(random.choice(range(97, 122))) for _ in range(16))}"
+    )
+
+
+def pool_options(config: StressConfig) -> dict[str, Any]:
+    return {
+        "max_connections": config.max_connections,
+        "max_keepalive": config.max_keepalive,
+        "keepalive_expiry": config.keepalive_expiry,
+        "http2": config.http2,
+    }
+
+
+def source_calls(datamap: CompactDatamap, pk: str, affirm: bool) -> list[Call]:
+    calls = [("save_observation", origin) for origin in datamap.observations(pk)]
+    if affirm:
+        calls += [("save_affirmations", origin) for origin in datamap.affirmations(pk)]
+    return calls
+
+
+def origin_calls(
+    objects: Iterable[dict[str, Any]],
+    datamap: CompactDatamap,
+    affirm: bool,
+    skip: set[str] = frozenset(),
+) -> Iterator[Call]:
+    for obj in objects:
+        if obj["primary_key"] not in skip:
+            yield from source_calls(datamap, obj["primary_key"], affirm)
+
+
+def run_stress(config: StressConfig) -> dict[str, Any] | None:
+    with interruptible(signal.SIGTERM, signal.SIGHUP):
+        return _run_stress(config)
+
+
+def _run_stress(config: StressConfig) -> dict[str, Any] | None:
+    def say(message: str):
+        print(f"{config.label}{message}")
+
+    resumed = None
+    if config.resume:
+        resumed = Checkpoint.load(config.resume)
+        config = replace(
+            config,
+            organisation=resumed["organisation"],
+            filename=resumed["datamap"]["filename"],
+            multiplier=resumed["multiplier"],
+            checkpoint=config.checkpoint or config.resume,
+            append_results=True,
+        )
+    page = config.page_size, config.prefetch
+    try:
+        with DatamapReader(config.filename) as reader:
+            fresh = config.fresh or reader.organisation == config.organisation
+            datamap = CompactDatamap.from_reader(reader, config.multiplier)
+            checksum = reader.checksum
+    except CorruptDatamap:
+        say(f"Datamap file {config.filename} seems corrupted.")
+        return None
+    if resumed is not None:
+        if checksum != resumed["datamap"]["checksum"]:
+            say(f"Datamap file {config.filename} changed since the checkpoint.")
+            return None
+        fresh = False
+    checkpoint = None
+    if config.checkpoint:
+        checkpoint = Checkpoint(config.checkpoint, config.checkpoint_interval)
+    start = time.perf_counter()
+    if config.multiplier > 1:
+        datamap.organisation = config.organisation
+    affirm = not config.noaffirm
+    fake = transport = async_transport = None
+    if config.backend == "fake":
+        fake = FakeOctopoes(
+            datamap.materialize(),
+            config.fake_latency,
+            config.fake_error_rate,
+            config.fake_throughput,
+            seed=0,
+        )
+        transport, async_transport = fake.transport(), fake.async_transport()
+    results = Results(config.results_file, config.append_results)
+    monitor = QueueMonitor(
+        config.rabbitmq_url,
+        config.rabbitmq_user,
+        config.rabbitmq_password,
+        config.vhost,
+        config.queue,
+        config.queue_interval,
+        config.queue_file,
+        transport,
+    )
+    monitor.start()
+    pool = Pool(config.url, transport=transport, **pool_options(config))
+    apool = AsyncPool(config.url, transport=async_transport, **pool_options(config))
+    organisation = config.organisation
+    if fresh:
+        organisation = random_organisation(config.organisation)
+    failures = Failures()
+    retry = RetryPolicy(
+        config.retries + 1, config.retry_backoff, config.retry_max, seed=0
+    )
+    noc = OctopoesClient(
+        config.url,
+        organisation,
+        transport=transport,
+        pool=pool,
+        retry=retry,
+        failures=failures,
+    )
+    state = resumed or {}
+    seeded = state.get("seeded", False)
+    phases = state.get("phases", {})
+    recalculate = state.get("recalculate", 0.0)
+    times = state.get("times", [])
+    operations = state.get("operations", [])
+    counter = state.get("rounds", 0)
+    diffs = state.get("diffs", 0)
+    server_time = state.get("server_time", 0.0)
+    submitted = set(state.get("submitted", ()))
+    snapshot = Snapshot(config.fingerprint)
+    pipeline = None
+    reads = None
+
+    def seed():
+        nonlocal recalculate
+        begin = time.perf_counter()
+        failures(
+            "save_many_declarations",
+            call(
+                noc,
+                "save_many_declarations",
+                [
+                    {"ooi": datamap.ooi(origin["source"])}
+                    for origin in datamap.origins("declarations")
+                ],
+            ),
+        )
+        phases["declarations"] = time.perf_counter() - begin
+        failures(
+            "save_many_scan_profile",
+            call(
+                noc,
+                "save_many_scan_profile",
+                [
+                    datamap.ooi(pk)["scan_profile"]
+                    for pk in datamap.sources("declarations")
+                ],
+            ),
+        )
+        if fake is None:
+            time.sleep(1)
+        begin = time.perf_counter()
+        failures("scan_profiles_recalculate", call(noc, "scan_profiles_recalculate"))
+        recalculate += time.perf_counter() - begin
+
+    def checkpoint_state() -> dict[str, Any]:
+        return {
+            "organisation": organisation,
+            "datamap": {"filename": config.filename, "checksum": checksum},
+            "multiplier": config.multiplier,
+            "seeded": seeded,
+            "phases": phases,
+            "recalculate": recalculate,
+            "times": times,
+            "operations": operations,
+            "rounds": counter,
+            "diffs": diffs,
+            "server_time": server_time,
+            "submitted": sorted(
+                submitted | (pipeline.submitted if pipeline is not None else set())
+            ),
+            "snapshot": {"objects": len(snapshot), "digest": snapshot.digest()},
+        }
+
+    runner = asyncio.Runner()
+    batcher = None
+    try:
+        if fresh:
+            say(f"organisation: {organisation}")
+            failures("node_create", call(noc, "node_create", organisation))
+            if fake is None:
+                time.sleep(0.5)
+        metrics = Metrics() if config.latency or config.latency_file else None
+        noc.metrics = metrics
+        if resumed is not None:
+            say(f"resuming {organisation} at round {counter}")
+        if not seeded:
+            say(f"declarations: {datamap.count("declarations")}")
+            seed()
+            seeded = True
+        if config.read_mix:
+            reads = ReadLoad(
+                noc.url,
+                organisation,
+                parse_read_mix(config.read_mix),
+                config.readers,
+                list(datamap) if config.read_sampling == "datamap" else None,
+                pool,
+                seed=0,
+            )
+            reads.start()
+        anoc = None
+        if config.concurrency > 1 or config.rate > 0 or config.pipeline:
+            anoc = AsyncOctopoesClient(
+                noc.url,
+                organisation,
+                metrics=metrics,
+                transport=async_transport,
+                pool=apool,
+                retry=retry,
+                failures=failures,
+            )
+        schedule = None
+        if config.rate > 0:
+            schedule = OpenLoop(config.rate, config.arrivals)
+        if config.batch_size > 1:
+            batcher = noc.batch(failures, config.batch_size, config.linger)
+        convergence = Convergence(
+            config.threshold,
+            config.timeout,
+            config.backoff_min,
+            config.backoff_max,
+            jitter=config.jitter,
+        )
+        if config.pipeline and resumed is None:
+            sources = set(datamap.sources("observations"))
+            if affirm:
+                sources.update(datamap.sources("affirmations"))
+            pipeline = Pipeline(
+                sources, lambda pk: source_calls(datamap, pk, affirm), page[0]
+            )
+            begin = time.perf_counter_ns()
+            operations.append(
+                runner.run(
+                    submit_pipelined(
+                        anoc,
+                        pipeline,
+                        config.concurrency,
+                        failures,
+                        convergence,
+                    )
+                )
+            )
+            times.append((time.perf_counter_ns() - begin) / 1e9)
+            visibility = pipeline.visibility.summary()
+            say(
+                f"pipeline: {operations[0]} origins in {times[0]:.3f}s, {pipeline.checks} checks, {len(pipeline.waiting)} unresolved, write visibility p50 {visibility["p50_ms"]:.2f}ms p99 {visibility["p99_ms"]:.2f}ms"
+            )
+        initial = update_snapshot(snapshot, noc, page)
+        if isinstance(initial, RequestFailed):
+            failures("iter_objects", initial)
+            initial = Diff([], [], [])
+        new_objects = initial.added
+        count = len(snapshot)
+        say(f"init: {count}")
+        if resumed is not None:
+            if snapshot.digest() != resumed["snapshot"]["digest"]:
+                say(
+                    f"objects changed since the checkpoint: {resumed["snapshot"]["objects"]} -> {count}"
+                )
+            new_objects = [
+                obj for obj in new_objects if obj["primary_key"] not in submitted
+            ]
+        confirmed = False
+        events = 1
+        while new_objects or not convergence.quiet or events > 0:
+            ops = 1
+            behind = None
+            begin = time.perf_counter_ns()
+            calls = origin_calls(
+                new_objects,
+                datamap,
+                affirm,
+                pipeline.submitted if pipeline is not None else frozenset(),
+            )
+            if schedule is not None:
+                sent, behind = runner.run(
+                    submit_open_loop(anoc, calls, schedule, failures)
+                )
+                ops += sent
+            elif anoc is not None:
+                ops += runner.run(
+                    submit_concurrently(anoc, calls, config.concurrency, failures)
+                )
+            elif batcher is not None:
+                ops += submit_batched(batcher, calls)
+            else:
+                ops += submit(noc, calls, failures)
+            submitted.update(obj["primary_key"] for obj in new_objects)
+            timediff = (time.perf_counter_ns() - begin) / 1e9
+            times.append(timediff)
+            operations.append(ops)
+            begin = time.perf_counter_ns()
+            failures(
+                "scan_profiles_recalculate", call(noc, "scan_profiles_recalculate")
+            )
+            recalculate += (time.perf_counter_ns() - begin) / 1e9
+            probe = call(noc, "count_objects")
+            diff = Diff([], [], [])
+            if isinstance(probe, RequestFailed):
+                # an idle round, so a server that keeps failing cannot stall the run
+                failures("count_objects", probe)
+            elif probe != count or (convergence.settling and not confirmed):
+                listed = update_snapshot(snapshot, noc, page)
+                if isinstance(listed, RequestFailed):
+                    failures("iter_objects", listed)
+                else:
+                    diff = listed
+                    confirmed = probe == count
+                    diffs += 1
+                    count = probe
+            refresh = (time.perf_counter_ns() - begin) / 1e9
+            server_time += timediff + refresh
+            new_objects = diff.added + diff.modified
+            events = monitor.messages
+            convergence.observe(bool(diff))
+            if diff:
+                confirmed = False
+            say(
+                f"{counter}: {count} +{len(diff.added)}/~{len(diff.modified)}/-{len(diff.removed)} ({ops}/{events}: {timediff}s)"
+                + (f" behind {behind:.3f}s" if behind is not None else "")
+            )
+            results.round(
+                organisation=organisation,
+                round=counter,
+                time=time.perf_counter() - start,
+                objects=count,
+                added=len(diff.added),
+                modified=len(diff.modified),
+                removed=len(diff.removed),
+                ops=ops,
+                submit_time=timediff,
+                refresh_time=refresh,
+                behind=behind,
+                queue=events,
+                delay=convergence.delay,
+                failures=failures.total,
+            )
+            convergence.sleep()
+            counter += 1
+            if checkpoint is not None and checkpoint.due():
+                checkpoint.save(checkpoint_state())
+        if reads is not None:
+            reads.stop()
+        phases["ingest"] = sum(times)
+        phases["recalculate"] = recalculate
+        phases["quiescence"] = convergence.quiescence_time
+        if batcher is not None:
+            batcher.close()
+            batcher = None
+        verification = Verification(
+            datamap,
+            ORIGIN_SECTIONS if affirm else ORIGIN_SECTIONS[1:],
+            config.verify_content,
+        )
+        try:
+            verification.run(noc.iter_objects(*page), noc.iter_origins(*page))
+        except RequestFailed as e:
+            failures("iter_objects", e)
+            say(f"could not list {organisation} to verify it: {e}")
+            verification = None
+        objects = (
+            verification.sections["oois"].actual
+            if verification is not None
+            else len(snapshot)
+        )
+        success = verification is not None and verification.ok
+        if success:
+            say(f"SUCCES: {len(datamap)} in ({sum(operations)}: {sum(times)})s")
+        elif verification is None:
+            say(
+                f"FAIL: {len(datamap)} ({datamap.organisation}) unverified ({organisation}) in ({sum(operations)}: {sum(times)}s)"
+            )
+        else:
+            say(
+                f"FAIL: {len(datamap)} ({datamap.organisation}) != {objects} ({organisation}) in ({sum(operations)}: {sum(times)}s)"
+            )
+            print(verification.table())
+            if config.dump:
+                for line in verification.details():
+                    say(line)
+        churn = None
+        if config.churn:
+            churn = Churn(
+                datamap,
+                config.churn_share,
+                lambda pk: source_calls(datamap, pk, affirm),
+                page[0],
+                seed=0,
+            )
+            if anoc is None:
+                anoc = AsyncOctopoesClient(
+                    noc.url,
+                    organisation,
+                    metrics=metrics,
+                    transport=async_transport,
+                    pool=apool,
+                    retry=retry,
+                    failures=failures,
+                )
+            for cycle in range(config.churn):
+                record = churn.cycle(
+                    noc,
+                    anoc,
+                    runner,
+                    monitor,
+                    config.concurrency,
+                    failures,
+                    lambda: Convergence(
+                        config.threshold,
+                        config.timeout,
+                        config.backoff_min,
+                        config.backoff_max,
+                        jitter=config.jitter,
+                    ),
+                )
+                say(
+                    f"churn {cycle}: -{record["retracted"]} origins -{record["deleted"]} oois, {record["objects"]} -> {record["trough"]} objects settled in {record["cascade_time"]:.2f}s, {record["resubmitted"]} resubmitted -> {record["restored"]} objects settled in {record["restore_time"]:.2f}s"
+                )
+        if config.bits:
+            begin = time.perf_counter()
+            inferred = call(noc, "bits_recalculate")
+            phases["bits"] = time.perf_counter() - begin
+            if isinstance(inferred, RequestFailed):
+                failures("bits_recalculate", inferred)
+            say(f"bits: {inferred} in {phases["bits"]:.3f}s")
+        origins = dict.fromkeys(ORIGIN_TYPES, 0)
+        try:
+            for origin in noc.iter_origins(*page):
+                origins[origin["origin_type"]] += 1
+        except RequestFailed as e:
+            failures("iter_origins", e)
+            origins = dict.fromkeys(ORIGIN_TYPES, 0)
+        origins["origin"] = sum(origins.values())
+        say(f"affirmations: {origins["affirmation"]}/{datamap.count("affirmations")}")
+        say(f"declarations: {origins["declaration"]}/{datamap.count("declarations")}")
+        say(f"observations: {origins["observation"]}/{datamap.count("observations")}")
+        say(f"inferences: {origins["inference"]}")
+        say(f"nibblets: {origins["nibblet"]}")
+        say(f"origins: {origins["origin"]}")
+        say(
+            f"quiescence: {convergence.quiescence_time:.2f}s ({counter} probes, {diffs} full diffs)"
+        )
+        if schedule is not None:
+            lag = schedule.lag.summary()
+            latency = schedule.latency.summary()
+            say(
+                f"open loop: {schedule.rate:g}/s {schedule.arrivals}, latency p50 {latency["p50_ms"]:.2f}ms p99 {latency["p99_ms"]:.2f}ms, lag p99 {lag["p99_ms"]:.2f}ms max {lag["max_ms"]:.2f}ms, behind {schedule.behind:.3f}s"
+            )
+        if reads is not None:
+            read_summary = reads.summary()
+            say(
+                f"reads: {read_summary["ops"]} by {config.readers} readers in {read_summary["elapsed"]:.2f}s ({read_summary["ops_per_second"]:.1f} reads/s, {read_summary["errors"]} errors)"
+            )
+            print(reads.metrics.table())
+            if reads.unexpected:
+                say(f"reads: {reads.unexpected.total} unexpected exceptions")
+                print(reads.unexpected.table())
+        if failures:
+            say(
+                f"failures: {failures.total} after {sum(failures.retries.values())} retries"
+            )
+            print(failures.table())
+        if metrics is not None:
+            if config.latency:
+                print(metrics.table())
+            if config.latency_file:
+                metrics.export(config.latency_file)
+        wall_time = time.perf_counter() - start
+        summary = {
+            "environment": environment(),
+            "url": noc.url,
+            "backend": config.backend,
+            "organisation": organisation,
+            "datamap": {
+                "filename": config.filename,
+                "checksum": checksum,
+                "oois": len(datamap),
+                **{section: datamap.count(section) for section in ORIGIN_SECTIONS},
+            },
+            "multiplier": config.multiplier,
+            "concurrency": config.concurrency,
+            "batch_size": config.batch_size,
+            "rate": config.rate,
+            "rounds": counter,
+            "ops": sum(operations),
+            "wall_time": wall_time,
+            "submit_time": sum(times),
+            "server_time": server_time,
+            "quiescence_time": convergence.quiescence_time,
+            "phases": phases,
+            "probes": counter,
+            "diffs": diffs,
+            "ops_per_second": sum(operations) / sum(times) if sum(times) else 0.0,
+            "expected_objects": len(datamap),
+            "objects": objects,
+            "success": success,
+            "verification": (
+                verification.summary() if verification is not None else None
+            ),
+            "queue": events,
+            "origins": origins,
+            "latency": metrics.summary() if metrics is not None else None,
+            "open_loop": schedule.summary() if schedule is not None else None,
+            "pipeline": pipeline.summary() if pipeline is not None else None,
+            "reads": reads.summary() if reads is not None else None,
+            "churn": churn.summary() if churn is not None else None,
+            "failures": failures.summary(),
+        }
+        monitor.stop()
+        summary["queue_samples"] = monitor.samples
+        if fake is not None:
+            summary["fake"] = {
+                "latency": config.fake_latency,
+                "error_rate": config.fake_error_rate,
+                "throughput": config.fake_throughput,
+                "requests": fake.requests,
+            }
+        results.summary(**summary)
+        results.close()
+    except BaseException as e:
+        if reads is not None:
+            reads.stop()
+        monitor.stop()
+        if checkpoint is not None:
+            checkpoint.save(checkpoint_state())
+            say(
+                f"interrupted ({e!r}): checkpoint in {checkpoint.filename}, continue with --resume {checkpoint.filename}"
+            )
+        elif config.noxterminate:
+            call(noc, "node_delete", organisation)
+            say(f"interrupted ({e!r}): deleted {organisation}")
+        pool.close()
+        raise
+    finally:
+        if batcher is not None:
+            batcher.close()
+        runner.run(apool.aclose())
+        runner.close()
+    if config.noxterminate:
+        deleted = call(noc, "node_delete", organisation)
+        if isinstance(deleted, RequestFailed):
+            say(f"could not delete {organisation}: {deleted}")
+        failures("node_delete", deleted)
+        summary["failures"] = failures.summary()
+        if checkpoint is not None and os.path.exists(checkpoint.filename):
+            os.remove(checkpoint.filename)
+    elif checkpoint is not None:
+        checkpoint.save(checkpoint_state())
+    pool.close()
+    return {**summary, "metrics": metrics, "failure_log": failures}
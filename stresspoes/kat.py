@@ -0,0 +1,175 @@
+import json
+import mmap
+import struct
+from typing import Any, Iterator
+
+import zstandard as zstd
+from dill import loads
+from xxhash import xxh3_64_intdigest
+from xxhash import xxh3_128_hexdigest as xxh3
+
+MAGIC = 0xC0DECA7
+VERSION = 2
+HEADER = struct.Struct("<IB")
+TRAILER = struct.Struct("<QQQI")
+SECTIONS = ("oois", "affirmations", "declarations", "observations")
+
+
+class CorruptDatamap(Exception):
+    pass
+
+
+class DatamapWriter:
+    def __init__(
+        self,
+        filename: str,
+        organisation: str,
+        chunk_size: int = 1024,
+        level: int = 3,
+    ):
+        self.organisation = organisation
+        self.chunk_size = chunk_size
+        self._compressor = zstd.ZstdCompressor(level=level)
+        self._buffers: dict[str, list[str]] = {section: [] for section in SECTIONS}
+        self._chunks: dict[str, list[tuple[int, int, int, str]]] = {
+            section: [] for section in SECTIONS
+        }
+        self._file = open(filename, "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION))
+
+    def __enter__(self) -> "DatamapWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+    def add(self, section: str, record: dict[str, Any]):
+        buffer = self._buffers[section]
+        buffer.append(json.dumps(record))
+        if len(buffer) >= self.chunk_size:
+            self._flush(section)
+
+    def _flush(self, section: str):
+        buffer = self._buffers[section]
+        if not buffer:
+            return
+        frame = self._compressor.compress("\n".join(buffer).encode())
+        self._chunks[section].append(
+            (self._file.tell(), len(frame), len(buffer), xxh3(frame))
+        )
+        self._file.write(frame)
+        buffer.clear()
+
+    def close(self):
+        for section in SECTIONS:
+            self._flush(section)
+        footer = self._compressor.compress(
+            json.dumps(
+                {"organisation": self.organisation, "sections": self._chunks}
+            ).encode()
+        )
+        offset = self._file.tell()
+        self._file.write(footer)
+        self._file.write(
+            TRAILER.pack(offset, len(footer), xxh3_64_intdigest(footer), MAGIC)
+        )
+        self._file.close()
+
+
+class DatamapReader:
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._decompressor = zstd.ZstdDecompressor()
+        with open(filename, "rb") as file:
+            head = file.read(HEADER.size)
+            if len(head) == HEADER.size and HEADER.unpack(head) == (MAGIC, VERSION):
+                self.version = VERSION
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.version = 1
+                self._map = None
+                self._datamap = self._load_v1(head + file.read())
+        if self._map is not None:
+            self._read_footer()
+
+    def __enter__(self) -> "DatamapReader":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+
+    def _load_v1(self, data: bytes) -> dict[str, Any]:
+        try:
+            magic, datamap, checksum = loads(self._decompressor.decompress(data))
+        except Exception as e:
+            raise CorruptDatamap(self.filename) from e
+        if magic != MAGIC or checksum != xxh3(datamap):
+            raise CorruptDatamap(self.filename)
+        datamap = loads(datamap)
+        self.organisation: str = datamap["organisation"]
+        self.checksum: str = checksum
+        return datamap
+
+    def _read_footer(self):
+        if len(self._map) < HEADER.size + TRAILER.size:
+            raise CorruptDatamap(self.filename)
+        offset, length, checksum, magic = TRAILER.unpack(self._map[-TRAILER.size :])
+        footer = self._map[offset : offset + length]
+        if magic != MAGIC or xxh3_64_intdigest(footer) != checksum:
+            raise CorruptDatamap(self.filename)
+        footer = json.loads(self._decompressor.decompress(footer))
+        self.organisation = footer["organisation"]
+        self.checksum = f"{checksum:016x}"
+        self._chunks: dict[str, list[list]] = footer["sections"]
+
+    def count(self, section: str) -> int:
+        if self.version == 1:
+            return len(self._datamap[section])
+        return sum(chunk[2] for chunk in self._chunks[section])
+
+    def records(self, section: str) -> Iterator[dict[str, Any]]:
+        if self.version == 1:
+            if section == "oois":
+                yield from self._datamap["oois"].values()
+            else:
+                yield from self._datamap[section]
+            return
+        for i in range(len(self._chunks[section])):
+            yield from self.chunk(section, i)
+
+    def chunks(self, section: str) -> int:
+        if self.version == 1:
+            return 1
+        return len(self._chunks[section])
+
+    def chunk(self, section: str, i: int) -> list[dict[str, Any]]:
+        if self.version == 1:
+            return list(self.records(section))
+        offset, length, _, checksum = self._chunks[section][i]
+        frame = self._map[offset : offset + length]
+        if xxh3(frame) != checksum:
+            raise CorruptDatamap(f"{self.filename}: {section}@{offset}")
+        return [
+            json.loads(line)
+            for line in self._decompressor.decompress(frame).splitlines()
+        ]
+
+    def load(self) -> dict[str, Any]:
+        if self.version == 1:
+            return self._datamap
+        return {
+            "organisation": self.organisation,
+            "oois": {obj["primary_key"]: obj for obj in self.records("oois")},
+            **{
+                section: list(self.records(section))
+                for section in SECTIONS
+                if section != "oois"
+            },
+        }
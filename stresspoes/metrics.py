@@ -0,0 +1,165 @@
+import csv
+import json
+import math
+import threading
+from typing import Any
+
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+def label(percentile: float) -> str:
+    return "p" + f"{percentile:g}".replace(".", "")
+
+
+class Histogram:
+    def __init__(self, precision: int = 7):
+        self.precision = precision
+        self.counts: dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def _key(self, value: int) -> int:
+        shift = max(0, value.bit_length() - self.precision)
+        return (shift << self.precision) | (value >> shift)
+
+    def _value(self, key: int) -> int:
+        shift = key >> self.precision
+        mantissa = key & ((1 << self.precision) - 1)
+        return (mantissa << shift) + ((1 << shift) >> 1)
+
+    def record(self, value: int):
+        value = max(0, value)
+        key = self._key(value)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.min = value if self.count == 0 else min(self.min, value)
+        self.max = max(self.max, value)
+        self.count += 1
+        self.total += value
+
+    def merge(self, other: "Histogram"):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.min = other.min if self.count == 0 else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, percentile: float) -> int:
+        if self.count == 0:
+            return 0
+        rank = max(1, math.ceil(percentile / 100 * self.count))
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= rank:
+                return min(max(self._value(key), self.min), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": self.mean() / 1e6,
+            **{
+                f"{label(percentile)}_ms": self.percentile(percentile) / 1e6
+                for percentile in PERCENTILES
+            },
+            "max_ms": self.max / 1e6,
+        }
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses: dict[int, int] = {}
+        self.sent = 0
+        self.received = 0
+
+    @property
+    def errors(self) -> int:
+        return sum(
+            count
+            for status, count in self.statuses.items()
+            if status == 0 or status >= 400
+        )
+
+    def summary(self) -> dict[str, Any]:
+        count = self.latency.count
+        return {
+            **self.latency.summary(),
+            "errors": self.errors,
+            "error_rate": self.errors / count if count else 0.0,
+            "bytes_sent": self.sent,
+            "bytes_received": self.received,
+            "statuses": {str(status): n for status, n in sorted(self.statuses.items())},
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.endpoints: dict[str, EndpointStats] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"endpoints": self.endpoints}
+
+    def __setstate__(self, state: dict[str, Any]):
+        self.endpoints = state["endpoints"]
+        self._lock = threading.Lock()
+
+    def record(
+        self, endpoint: str, latency: int, status: int, sent: int, received: int
+    ):
+        with self._lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats()
+            stats.latency.record(latency)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.sent += sent
+            stats.received += received
+
+    def merge(self, other: "Metrics"):
+        with self._lock:
+            for endpoint, theirs in other.endpoints.items():
+                stats = self.endpoints.get(endpoint)
+                if stats is None:
+                    stats = self.endpoints[endpoint] = EndpointStats()
+                stats.latency.merge(theirs.latency)
+                for status, count in theirs.statuses.items():
+                    stats.statuses[status] = stats.statuses.get(status, 0) + count
+                stats.sent += theirs.sent
+                stats.received += theirs.received
+
+    def summary(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [
+                {"endpoint": endpoint, **stats.summary()}
+                for endpoint, stats in sorted(self.endpoints.items())
+            ]
+
+    def table(self) -> str:
+        header = ["endpoint", "count", "err%"] + [label(p) for p in PERCENTILES]
+        lines = [f"{header[0]:<40} {header[1]:>8} {header[2]:>6}"]
+        lines[0] += "".join(f" {column:>9}" for column in header[3:]) + " (ms)"
+        for row in self.summary():
+            line = f"{row['endpoint']:<40} {row['count']:>8} {row['error_rate']:>6.1%}"
+            line += "".join(f" {row[f'{label(p)}_ms']:>9.2f}" for p in PERCENTILES)
+            lines.append(line)
+        return "\n".join(lines)
+
+    def export(self, filename: str):
+        rows = self.summary()
+        with open(filename, "w", newline="") as file:
+            if filename.endswith(".csv"):
+                fields = ["endpoint", *EndpointStats().summary()]
+                fields.remove("statuses")
+                writer = csv.DictWriter(file, fields, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                json.dump(rows, file, indent=2)
@@ -0,0 +1,86 @@
+import re
+from typing import Any, Callable, Iterable, Iterator
+
+Builder = Callable[[str], Any]
+Records = Callable[[str], Iterable[dict[str, Any]]]
+
+NETWORK = re.compile(r"^Network\|[^|]+$")
+
+
+def find_network(oois: Iterable[str]) -> str | None:
+    for pk in oois:
+        if NETWORK.match(pk):
+            return pk.split("|")[-1]
+    return None
+
+
+def compile_rewrite(value: Any, target: str) -> Builder | None:
+    if isinstance(value, str):
+        segments = value.split("|")
+        positions = [i for i, segment in enumerate(segments) if segment == target]
+        if not positions:
+            return None
+
+        def rewrite_str(replacement: str) -> str:
+            rewritten = list(segments)
+            for i in positions:
+                rewritten[i] = replacement
+            return "|".join(rewritten)
+
+        return rewrite_str
+    if isinstance(value, dict):
+        builders = {
+            key: builder
+            for key, item in value.items()
+            if (builder := compile_rewrite(item, target)) is not None
+        }
+        if not builders:
+            return None
+        return lambda replacement: {
+            **value,
+            **{key: builder(replacement) for key, builder in builders.items()},
+        }
+    if isinstance(value, list):
+        builders = {
+            i: builder
+            for i, item in enumerate(value)
+            if (builder := compile_rewrite(item, target)) is not None
+        }
+        if not builders:
+            return None
+        return lambda replacement: [
+            builders[i](replacement) if i in builders else item
+            for i, item in enumerate(value)
+        ]
+    return None
+
+
+class Multiplier:
+    """Copies every record mentioning the network once per extra network.
+
+    Records are streamed per section from `records`, so a reader can be
+    expanded without loading the base datamap.
+    """
+
+    def __init__(self, records: Records, multiplier: int):
+        self.records = records
+        self.target = find_network(obj["primary_key"] for obj in records("oois"))
+        self.replacements = []
+        if self.target is not None:
+            self.replacements = [f"{self.target}-{i}" for i in range(multiplier - 1)]
+
+    def _expand(self, records: Iterator[Any]) -> Iterator[Any]:
+        for record in records:
+            yield record
+            if not self.replacements:
+                continue
+            builder = compile_rewrite(record, self.target)
+            if builder is not None:
+                for replacement in self.replacements:
+                    yield builder(replacement)
+
+    def oois(self) -> Iterator[dict[str, Any]]:
+        return self._expand(iter(self.records("oois")))
+
+    def origins(self, section: str) -> Iterator[dict[str, Any]]:
+        return self._expand(iter(self.records(section)))
@@ -1,39 +1,226 @@
+import asyncio
 import datetime
+import itertools
 import sys
-from typing import Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator
 
 import httpx
+from failures import (
+    Failures,
+    RequestFailed,
+    RetryPolicy,
+    classify_error,
+    classify_status,
+)
+from metrics import Metrics
 from pydantic import JsonValue
 
 
-class OctopoesClient:
-    def __init__(self, base_url: str, organisation: str, timeout: int | None = None):
+class Pool:
+    """One connection pool for every client of an Octopoes instance.
+
+    Clients address their organisation through a path prefix, so any
+    number of organisations share the same bounded set of keep-alive
+    connections.
+    """
+
+    client_type: type[httpx.Client] | type[httpx.AsyncClient] = httpx.Client
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: int | None = None,
+        max_connections: int | None = 100,
+        max_keepalive: int | None = 20,
+        keepalive_expiry: float | None = 5.0,
+        http2: bool = False,
+        transport: httpx.BaseTransport | httpx.AsyncBaseTransport | None = None,
+    ):
         self.url = base_url
-        self.org = organisation
         self.timeout = timeout
-        self._root = httpx.Client(
-            base_url=f"{self.url}",
+        self.transport = transport
+        self.http = self.client_type(
+            base_url=base_url,
             headers={"Accept": "application/json"},
-            timeout=self.timeout,
-        )
-        self._client = httpx.Client(
-            base_url=f"{self.url}/{self.org}",
-            headers={"Accept": "application/json"},
-            timeout=self.timeout,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2=http2,
+            transport=transport,
         )
 
+    def __enter__(self) -> "Pool":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.http.close()
+
+
+class AsyncPool(Pool):
+    client_type = httpx.AsyncClient
+
+    def __enter__(self) -> "AsyncPool":
+        raise TypeError("AsyncPool is closed with aclose(), use async with")
+
+    def close(self):
+        raise TypeError("AsyncPool is closed with aclose(), use async with")
+
+    async def __aenter__(self) -> "AsyncPool":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.http.aclose()
+
+
+class OctopoesClient:
+    pool_type = Pool
+
+    def __init__(
+        self,
+        base_url: str,
+        organisation: str,
+        timeout: int | None = None,
+        metrics: Metrics | None = None,
+        transport: httpx.BaseTransport | None = None,
+        pool: Pool | None = None,
+        retry: RetryPolicy | None = None,
+        failures: Failures | None = None,
+    ):
+        self.url = base_url
+        self.org = organisation
+        self.timeout = timeout
+        self.metrics = metrics
+        self.transport = transport
+        self.retry = retry
+        self.failures = failures
+        self._owned = pool is None
+        self.pool = pool or self.pool_type(base_url, timeout, transport=transport)
+
+    def __enter__(self) -> "OctopoesClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._owned:
+            self.pool.close()
+
     def _organisation(self, org: str):
         self.org = org
-        self._root = httpx.Client(
-            base_url=f"{self.url}",
-            headers={"Accept": "application/json"},
-            timeout=self.timeout,
-        )
-        self._client = httpx.Client(
-            base_url=f"{self.url}/{self.org}",
-            headers={"Accept": "application/json"},
-            timeout=self.timeout,
-        )
+
+    def _path(self, url: str, root: bool) -> str:
+        return url if root else f"{self.org}/{url.lstrip("/")}"
+
+    def _record(
+        self,
+        method: str,
+        endpoint: str,
+        begin: int,
+        res: httpx.Response | None,
+    ):
+        if self.metrics is None:
+            return
+        latency = time.perf_counter_ns() - begin
+        if res is None:
+            self.metrics.record(f"{method} {endpoint}", latency, 0, 0, 0)
+        else:
+            self.metrics.record(
+                f"{method} {endpoint}",
+                latency,
+                res.status_code,
+                len(res.request.content),
+                len(res.content),
+            )
+
+    def _result(self, name: str, res: httpx.Response) -> JsonValue:
+        category = classify_status(res.status_code)
+        if category is not None:
+            raise RequestFailed(name, category, res.status_code, res.text)
+        if not res.content:
+            return None
+        try:
+            return res.json()
+        except ValueError as e:
+            raise RequestFailed(name, "decode", res.status_code, str(e)) from e
+
+    def _backoff(
+        self, failure: RequestFailed, attempt: int, res: httpx.Response | None
+    ) -> float:
+        if (
+            self.retry is None
+            or not failure.retryable
+            or attempt + 1 >= self.retry.attempts
+        ):
+            raise failure
+        if self.failures is not None:
+            self.failures.retry(failure.endpoint, failure.category, failure.detail)
+        retry_after = res.headers.get("Retry-After") if res is not None else None
+        return self.retry.delay(attempt, retry_after)
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        root: bool = False,
+        endpoint: str | None = None,
+        **kwargs: Any,
+    ) -> JsonValue:
+        name = f"{method} {endpoint or url}"
+        for attempt in itertools.count():
+            begin = time.perf_counter_ns()
+            res = None
+            try:
+                res = self.pool.http.request(method, self._path(url, root), **kwargs)
+            except httpx.HTTPError as e:
+                self._record(method, endpoint or url, begin, None)
+                failure = RequestFailed(name, classify_error(e), 0, str(e))
+            else:
+                self._record(method, endpoint or url, begin, res)
+                try:
+                    return self._result(name, res)
+                except RequestFailed as e:
+                    failure = e
+            time.sleep(self._backoff(failure, attempt, res))
+
+    def _paginate(
+        self,
+        fetch: Callable[[int, int], list[dict[str, Any]]],
+        page_size: int,
+        prefetch: bool,
+    ) -> Iterator[dict[str, Any]]:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            offset = 0
+            page = fetch(offset, page_size)
+            while True:
+                offset += page_size
+                following = None
+                if prefetch and len(page) == page_size:
+                    following = pool.submit(fetch, offset, page_size)
+                yield from page
+                if len(page) < page_size:
+                    return
+                page = following.result() if following else fetch(offset, page_size)
+
+    def batch(
+        self,
+        report: Callable[[str, JsonValue], None],
+        batch_size: int = 64,
+        linger: float = 0.05,
+    ) -> "OriginBatcher":
+        return OriginBatcher(self, report, batch_size, linger)
 
     def _gettime(self, time: datetime.datetime | None) -> str:
         if time is None:
@@ -41,14 +228,10 @@ class OctopoesClient:
         return time.isoformat()
 
     def roothealth(self) -> JsonValue:
-        res = self._root.get("/health")
-
-        return res.json()
+        return self._request("GET", "/health", root=True)
 
     def health(self) -> JsonValue:
-        res = self._client.get("/health")
-
-        return res.json()
+        return self._request("GET", "/health")
 
     def objects(
         self,
@@ -75,9 +258,21 @@ class OctopoesClient:
         }
         params = {k: v for k, v in params.items() if v is not None}
 
-        res = self._client.get("/objects", params=params)
+        return self._request("GET", "/objects", params=params)
+
+    def iter_objects(
+        self, page_size: int = 1000, prefetch: bool = False, **kwargs: Any
+    ) -> Iterator[dict[str, Any]]:
+        return self._paginate(
+            lambda offset, limit: self.objects(offset=offset, limit=limit, **kwargs)[
+                "items"
+            ],
+            page_size,
+            prefetch,
+        )
 
-        return res.json()
+    def count_objects(self, **kwargs: Any) -> int:
+        return self.objects(offset=0, limit=1, **kwargs)["count"]
 
     def query(
         self,
@@ -93,9 +288,7 @@ class OctopoesClient:
             "valid_time": self._gettime(valid_time),
         }
 
-        res = self._client.get("/query", params=params)
-
-        return res.json()
+        return self._request("GET", "/query", params=params)
 
     def query_many(
         self,
@@ -109,9 +302,7 @@ class OctopoesClient:
             "valid_time": self._gettime(valid_time),
         }
 
-        res = self._client.get("/query_many", params=params)
-
-        return res.json()
+        return self._request("GET", "/query_many", params=params)
 
     def load_bulk(
         self,
@@ -122,9 +313,9 @@ class OctopoesClient:
             "valid_time": self._gettime(valid_time),
         }
 
-        res = self._client.post("/objects/load_bulk", params=params, json=references)
-
-        return res.json()
+        return self._request(
+            "POST", "/objects/load_bulk", params=params, json=references
+        )
 
     def object(
         self,
@@ -136,9 +327,7 @@ class OctopoesClient:
             "valid_time": self._gettime(valid_time),
         }
 
-        res = self._client.get("/object", params=params)
-
-        return res.json()
+        return self._request("GET", "/object", params=params)
 
     def object_history(
         self,
@@ -160,9 +349,7 @@ class OctopoesClient:
             "indices": indices,
         }
 
-        res = self._client.get("/object-history", params=params)
-
-        return res.json()
+        return self._request("GET", "/object-history", params=params)
 
     def random(
         self,
@@ -178,9 +365,7 @@ class OctopoesClient:
             "valid_time": self._gettime(valid_time),
         }
 
-        res = self._client.get("/objects/random", params=params)
-
-        return res.json()
+        return self._request("GET", "/objects/random", params=params)
 
     def delete(
         self, reference: str, valid_time: datetime.datetime | None = None
@@ -190,9 +375,7 @@ class OctopoesClient:
             "valid_time": self._gettime(valid_time),
         }
 
-        res = self._client.delete("/", params=params)
-
-        return res.json()
+        return self._request("DELETE", "/", params=params)
 
     def delete_origin(
         self, origin_id: str, valid_time: datetime.datetime | None = None
@@ -202,9 +385,7 @@ class OctopoesClient:
             "valid_time": self._gettime(valid_time),
         }
 
-        res = self._client.delete("/origins", params=params)
-
-        return res.json()
+        return self._request("DELETE", "/origins", params=params)
 
     def delete_many(
         self, references: list[str], valid_time: datetime.datetime | None = None
@@ -213,9 +394,9 @@ class OctopoesClient:
             "valid_time": self._gettime(valid_time),
         }
 
-        res = self._client.post("/objects/delete_many", params=params, json=references)
-
-        return res.json()
+        return self._request(
+            "POST", "/objects/delete_many", params=params, json=references
+        )
 
     def tree(
         self,
@@ -231,9 +412,7 @@ class OctopoesClient:
             "valid_time": self._gettime(valid_time),
         }
 
-        res = self._client.get("/tree", params=params)
-
-        return res.json()
+        return self._request("GET", "/tree", params=params)
 
     def origins(
         self,
@@ -258,9 +437,18 @@ class OctopoesClient:
         }
         params = {k: v for k, v in params.items() if v is not None}
 
-        res = self._client.get("/origins", params=params)
-
-        return res.json()
+        return self._request("GET", "/origins", params=params)
+
+    def iter_origins(
+        self, page_size: int = 1000, prefetch: bool = False, **kwargs: Any
+    ) -> Iterator[dict[str, Any]]:
+        # /origins returns a bare list without a total, so unlike objects
+        # there is no cheap count: counting origins means listing them
+        return self._paginate(
+            lambda offset, limit: self.origins(offset=offset, limit=limit, **kwargs),
+            page_size,
+            prefetch,
+        )
 
     def origin_parameters(
         self, origin_id: str, valid_time: datetime.datetime | None = None
@@ -270,27 +458,21 @@ class OctopoesClient:
             "valid_time": self._gettime(valid_time),
         }
 
-        res = self._client.get("/origin_parameters", params=params)
-
-        return res.json()
+        return self._request("GET", "/origin_parameters", params=params)
 
     def save_observation(
         self, origin: dict[str, Any], valid_time: datetime.datetime | None = None
     ) -> JsonValue:
         origin["valid_time"] = self._gettime(valid_time)
 
-        res = self._client.post("/observations", json=origin)
-
-        return res.json()
+        return self._request("POST", "/observations", json=origin)
 
     def save_declaration(
         self, origin: dict[str, Any], valid_time: datetime.datetime | None = None
     ) -> JsonValue:
         origin["valid_time"] = self._gettime(valid_time)
 
-        res = self._client.post("/declarations", json=origin)
-
-        return res.json()
+        return self._request("POST", "/declarations", json=origin)
 
     def save_many_declarations(
         self, origins: list[dict[str, Any]], valid_time: datetime.datetime | None = None
@@ -298,18 +480,14 @@ class OctopoesClient:
         for origin in origins:
             origin["valid_time"] = self._gettime(valid_time)
 
-        res = self._client.post("/declarations/save_many", json=origins)
-
-        return res.json()
+        return self._request("POST", "/declarations/save_many", json=origins)
 
     def save_affirmations(
         self, origin: dict[str, Any], valid_time: datetime.datetime | None = None
     ) -> JsonValue:
         origin["valid_time"] = self._gettime(valid_time)
 
-        res = self._client.post("/affirmations", json=origin)
-
-        return res.json()
+        return self._request("POST", "/affirmations", json=origin)
 
     def findings(
         self,
@@ -344,33 +522,27 @@ class OctopoesClient:
         }
         params = {k: v for k, v in params.items() if v is not None}
 
-        res = self._client.get("/findings", params=params)
-
-        return res.json()
+        return self._request("GET", "/findings", params=params)
 
     def findings_count_by_severity(
         self, valid_time: datetime.datetime | None = None
     ) -> JsonValue:
         params = {"valid_time": self._gettime(valid_time)}
 
-        res = self._client.get("/findings/count_by_severity", params=params)
-
-        return res.json()
+        return self._request("GET", "/findings/count_by_severity", params=params)
 
     def node_create(self, organisation: str) -> JsonValue:
-        res = self._root.post(f"{organisation}/node")
-
-        return res.json()
+        return self._request(
+            "POST", f"{organisation}/node", root=True, endpoint="{organisation}/node"
+        )
 
     def node_delete(self, organisation: str) -> JsonValue:
-        res = self._root.delete(f"{organisation}/node")
-
-        return res.json()
+        return self._request(
+            "DELETE", f"{organisation}/node", root=True, endpoint="{organisation}/node"
+        )
 
     def bits_recalculate(self) -> JsonValue:
-        res = self._client.post("bits/recalculate")
-
-        return res.json()
+        return self._request("POST", "bits/recalculate")
 
     def scan_profile(
         self, scan_profile_type: str | None, valid_time: datetime.datetime | None = None
@@ -381,18 +553,14 @@ class OctopoesClient:
         }
         params = {k: v for k, v in params.items() if v is not None}
 
-        res = self._client.get("/scan_profiles", params=params)
-
-        return res.json()
+        return self._request("GET", "/scan_profiles", params=params)
 
     def save_scan_profile(
         self, scan_profile: dict[str, Any], valid_time: datetime.datetime | None = None
     ) -> JsonValue:
         params = {"valid_time": self._gettime(valid_time)}
 
-        res = self._client.put("/scan_profiles", params=params, json=scan_profile)
-
-        return res.json()
+        return self._request("PUT", "/scan_profiles", params=params, json=scan_profile)
 
     def save_many_scan_profile(
         self,
@@ -401,20 +569,16 @@ class OctopoesClient:
     ) -> JsonValue:
         params = {"valid_time": self._gettime(valid_time)}
 
-        res = self._client.post(
-            "/scan_profiles/save_many", params=params, json=scan_profile
+        return self._request(
+            "POST", "/scan_profiles/save_many", params=params, json=scan_profile
         )
 
-        return res.json()
-
     def scan_profiles_recalculate(
         self, valid_time: datetime.datetime | None = None
     ) -> JsonValue:
         params = {"valid_time": self._gettime(valid_time)}
 
-        res = self._client.get("/scan_profiles/recalculate", params=params)
-
-        return res.json()
+        return self._request("GET", "/scan_profiles/recalculate", params=params)
 
     def scan_profiles_inheritance(
         self, reference: str, valid_time: datetime.datetime | None = None
@@ -424,6 +588,191 @@ class OctopoesClient:
             "valid_time": self._gettime(valid_time),
         }
 
-        res = self._client.get("/scan_profiles/recalculate", params=params)
+        return self._request("GET", "/scan_profiles/recalculate", params=params)
+
+
+class OriginBatcher:
+    """Groups origin writes into batches sent by a fixed pool of workers.
+
+    Declarations and scan profiles go out through their bulk endpoints, other
+    calls one by one. `add` only blocks while `backlog` calls are pending.
+    """
 
-        return res.json()
+    bulk = {
+        "save_declaration": "save_many_declarations",
+        "save_scan_profile": "save_many_scan_profile",
+    }
+
+    def __init__(
+        self,
+        client: OctopoesClient,
+        report: Callable[[str, JsonValue], None],
+        batch_size: int = 64,
+        linger: float = 0.05,
+        workers: int = 8,
+    ):
+        self.client = client
+        self.report = report
+        self.batch_size = batch_size
+        self.linger = linger
+        self.backlog = workers * batch_size
+        self._queues: dict[str, list[dict[str, Any]]] = {}
+        self._since: dict[str, float] = {}
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._closed = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._lingerer = threading.Thread(target=self._linger, daemon=True)
+        self._lingerer.start()
+
+    def __enter__(self) -> "OriginBatcher":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, method: str, payload: dict[str, Any]):
+        with self._cond:
+            queue = self._queues.setdefault(method, [])
+            if not queue:
+                self._since[method] = time.monotonic()
+            queue.append(payload)
+            batch = self._take(method) if len(queue) >= self.batch_size else None
+        if batch:
+            self._send(method, batch)
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending <= self.backlog)
+
+    def flush(self):
+        with self._cond:
+            batches = [(method, self._take(method)) for method in list(self._queues)]
+        for method, batch in batches:
+            self._send(method, batch)
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending == 0)
+
+    def close(self):
+        self.flush()
+        self._closed.set()
+        self._lingerer.join()
+        self._pool.shutdown()
+
+    def _take(self, method: str) -> list[dict[str, Any]]:
+        self._since.pop(method, None)
+        self._pending += 1
+        return self._queues.pop(method)
+
+    def _linger(self):
+        while not self._closed.wait(max(self.linger / 2, 0.001)):
+            now = time.monotonic()
+            with self._cond:
+                batches = [
+                    (method, self._take(method))
+                    for method, since in list(self._since.items())
+                    if now - since >= self.linger
+                ]
+            for method, batch in batches:
+                self._send(method, batch)
+
+    def _call(self, method: str, payload: Any) -> JsonValue | RequestFailed:
+        try:
+            return getattr(self.client, method)(payload)
+        except RequestFailed as e:
+            return e
+
+    def _send(self, method: str, payloads: list[dict[str, Any]]):
+        if method in self.bulk:
+            calls = [(self.bulk[method], payloads)]
+        else:
+            calls = [(method, payload) for payload in payloads]
+        with self._cond:
+            # the calls replace the pending batch counted by _take
+            self._pending += len(calls) - 1
+        for call in calls:
+            self._pool.submit(self._dispatch, *call)
+
+    def _dispatch(self, method: str, payload: Any):
+        try:
+            self.report(method, self._call(method, payload))
+        finally:
+            with self._cond:
+                self._pending -= 1
+                self._cond.notify_all()
+
+
+class AsyncOctopoesClient(OctopoesClient):
+    pool_type = AsyncPool
+    pool: AsyncPool
+
+    def __enter__(self) -> "AsyncOctopoesClient":
+        raise TypeError("AsyncOctopoesClient is closed with aclose(), use async with")
+
+    def close(self):
+        raise TypeError("AsyncOctopoesClient is closed with aclose(), use async with")
+
+    async def __aenter__(self) -> "AsyncOctopoesClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        root: bool = False,
+        endpoint: str | None = None,
+        **kwargs: Any,
+    ) -> JsonValue:
+        name = f"{method} {endpoint or url}"
+        for attempt in itertools.count():
+            begin = time.perf_counter_ns()
+            res = None
+            try:
+                res = await self.pool.http.request(
+                    method, self._path(url, root), **kwargs
+                )
+            except httpx.HTTPError as e:
+                self._record(method, endpoint or url, begin, None)
+                failure = RequestFailed(name, classify_error(e), 0, str(e))
+            else:
+                self._record(method, endpoint or url, begin, res)
+                try:
+                    return self._result(name, res)
+                except RequestFailed as e:
+                    failure = e
+            await asyncio.sleep(self._backoff(failure, attempt, res))
+
+    async def _paginate(
+        self,
+        fetch: Callable[[int, int], Any],
+        page_size: int,
+        prefetch: bool,
+    ) -> AsyncIterator[dict[str, Any]]:
+        offset = 0
+        page = await fetch(offset, page_size)
+        while True:
+            offset += page_size
+            following = None
+            if prefetch and len(page) == page_size:
+                following = asyncio.create_task(fetch(offset, page_size))
+            for item in page:
+                yield item
+            if len(page) < page_size:
+                return
+            page = await (following or fetch(offset, page_size))
+
+    def iter_objects(
+        self, page_size: int = 1000, prefetch: bool = False, **kwargs: Any
+    ) -> AsyncIterator[dict[str, Any]]:
+        async def fetch(offset: int, limit: int) -> list[dict[str, Any]]:
+            return (await self.objects(offset=offset, limit=limit, **kwargs))["items"]
+
+        return self._paginate(fetch, page_size, prefetch)
+
+    async def count_objects(self, **kwargs: Any) -> int:
+        return (await self.objects(offset=0, limit=1, **kwargs))["count"]
+
+    async def aclose(self):
+        if self._owned:
+            await self.pool.aclose()
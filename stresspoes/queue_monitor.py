@@ -0,0 +1,96 @@
+import json
+import threading
+import time
+from typing import Any
+
+import httpx
+
+
+def rate(stats: dict[str, Any], key: str) -> float | None:
+    return stats.get(f"{key}_details", {}).get("rate")
+
+
+class QueueMonitor:
+    def __init__(
+        self,
+        url: str = "http://localhost:15672",
+        username: str | None = None,
+        password: str | None = None,
+        vhost: str = "kat",
+        queue: str = "octopoes",
+        interval: float = 1.0,
+        filename: str | None = None,
+        transport: httpx.BaseTransport | None = None,
+    ):
+        self.interval = interval
+        self.filename = filename
+        self.samples = 0
+        self.latest: dict[str, Any] = {}
+        self._client = httpx.Client(
+            base_url=url,
+            auth=(username, password) if username and password else None,
+            timeout=max(interval, 1.0),
+            transport=transport,
+        )
+        self._path = f"/api/queues/{vhost}/{queue}"
+        self._file = open(filename, "w") if filename else None
+        self._start = time.perf_counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "QueueMonitor":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def messages(self) -> int:
+        return self.latest.get("messages", -1)
+
+    def start(self):
+        self.sample()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._client.close()
+        if self._file is not None:
+            self._file.close()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> dict[str, Any]:
+        sample: dict[str, Any] = {
+            "time": time.time(),
+            "elapsed": time.perf_counter() - self._start,
+        }
+        try:
+            response = self._client.get(self._path)
+            if response.status_code == 200:
+                info = response.json()
+                stats = info.get("message_stats", {})
+                sample |= {
+                    "messages": info.get("messages", -1),
+                    "messages_ready": info.get("messages_ready"),
+                    "messages_unacknowledged": info.get("messages_unacknowledged"),
+                    "consumers": info.get("consumers"),
+                    "publish_rate": rate(stats, "publish"),
+                    "deliver_rate": rate(stats, "deliver_get"),
+                    "ack_rate": rate(stats, "ack"),
+                }
+            else:
+                sample |= {"messages": -1, "error": response.status_code}
+        except Exception as e:
+            sample |= {"messages": -1, "error": type(e).__name__}
+        self.latest = sample
+        self.samples += 1
+        if self._file is not None:
+            self._file.write(json.dumps(sample) + "\n")
+            self._file.flush()
+        return sample
@@ -0,0 +1,160 @@
+import threading
+import time
+from random import Random
+from typing import Any, Callable
+
+from failures import DETAIL, Failures, RequestFailed
+from metrics import Metrics
+from octopoes_client import OctopoesClient, Pool
+
+PATHS = {
+    "Network": "Network.<network[is Hostname]",
+    "Hostname": "Hostname.<hostname[is ResolvedHostname]",
+    "IPAddressV4": "IPAddressV4.<address[is IPPort]",
+    "IPAddressV6": "IPAddressV6.<address[is IPPort]",
+    "IPPort": "IPPort.<ip_port[is IPService]",
+}
+BULK = 16
+
+
+def path(reference: str) -> str:
+    return PATHS.get(reference.partition("|")[0], PATHS["Network"])
+
+
+def query_many(client: OctopoesClient, sample: Callable[[], str], rng: Random) -> Any:
+    reference = sample()
+    return client.query_many(path(reference), [reference])
+
+
+Read = Callable[[OctopoesClient, Callable[[], str], Random], Any]
+
+READS: dict[str, Read] = {
+    "object": lambda client, sample, rng: client.object(sample()),
+    "object_history": lambda client, sample, rng: client.object_history(
+        sample(), limit=10
+    ),
+    "load_bulk": lambda client, sample, rng: client.load_bulk(
+        [sample() for _ in range(BULK)]
+    ),
+    "tree": lambda client, sample, rng: client.tree([], sample()),
+    "query": lambda client, sample, rng: client.query(path(sample()), limit=100),
+    "query_many": query_many,
+    "random": lambda client, sample, rng: client.random(str(rng.random())),
+    "findings": lambda client, sample, rng: client.findings(limit=100),
+    "findings_count_by_severity": lambda client, sample, rng: (
+        client.findings_count_by_severity()
+    ),
+}
+
+
+def parse_read_mix(spec: str) -> dict[str, float]:
+    mix = {}
+    for part in filter(None, spec.split(",")):
+        read, _, weight = part.partition("=")
+        if read not in READS:
+            raise ValueError(
+                f"unknown read {read!r}, expected one of {", ".join(READS)}"
+            )
+        try:
+            mix[read] = float(weight) if weight else 1.0
+        except ValueError as e:
+            raise ValueError(f"weight of {read} is not a number: {weight!r}") from e
+        if mix[read] < 0:
+            raise ValueError(f"weight of {read} is negative: {weight}")
+    if mix and not sum(mix.values()):
+        raise ValueError(f"read mix has no positive weight: {spec!r}")
+    return mix
+
+
+class ReadLoad:
+    def __init__(
+        self,
+        url: str,
+        organisation: str,
+        mix: dict[str, float],
+        readers: int = 1,
+        references: list[str] | None = None,
+        pool: Pool | None = None,
+        seed: int | None = None,
+    ):
+        self.url = url
+        self.organisation = organisation
+        self.reads = list(mix)
+        self.weights = list(mix.values())
+        self.references = references
+        self.pool = pool
+        self.metrics = Metrics()
+        self.ops = 0
+        self.errors = 0
+        # exceptions other than RequestFailed, by read and exception type
+        self.unexpected = Failures()
+        self._seed = Random(seed)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(
+                target=self._run, args=(self._seed.getrandbits(64),), daemon=True
+            )
+            for _ in range(readers)
+        ]
+        self._start = 0.0
+        self.elapsed = 0.0
+
+    def __enter__(self) -> "ReadLoad":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        self._start = time.perf_counter()
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join()
+        self.elapsed = time.perf_counter() - self._start
+
+    def _run(self, seed: int):
+        rng = Random(seed)
+        client = OctopoesClient(
+            self.url, self.organisation, metrics=self.metrics, pool=self.pool
+        )
+
+        def sample() -> str:
+            if self.references:
+                return rng.choice(self.references)
+            found = client.random(str(rng.random()))
+            return found[0] if isinstance(found, list) and found else ""
+
+        while not self._stop.is_set():
+            read = rng.choices(self.reads, self.weights)[0]
+            failed = False
+            try:
+                READS[read](client, sample, rng)
+            except RequestFailed:
+                failed = True
+            except Exception as e:
+                self.unexpected.record(read, type(e).__name__, str(e)[:DETAIL])
+                failed = True
+            with self._lock:
+                self.ops += 1
+                self.errors += failed
+        client.close()
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "mix": dict(zip(self.reads, self.weights)),
+            "readers": len(self._threads),
+            "sampling": "datamap" if self.references else "random",
+            "ops": self.ops,
+            "errors": self.errors,
+            "unexpected": self.unexpected.summary(),
+            "elapsed": self.elapsed,
+            "ops_per_second": self.ops / self.elapsed if self.elapsed else 0.0,
+            "latency": self.metrics.summary(),
+        }
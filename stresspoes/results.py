@@ -0,0 +1,132 @@
+import json
+import os
+import platform
+import socket
+import sys
+from importlib.metadata import PackageNotFoundError, version
+from typing import Any, Iterable
+
+METRICS = {
+    "ops_per_second": 1,
+    "wall_time": -1,
+    "submit_time": -1,
+    "server_time": -1,
+    "quiescence_time": -1,
+    "rounds": -1,
+}
+
+
+def package_version(package: str) -> str | None:
+    try:
+        return version(package)
+    except PackageNotFoundError:
+        return None
+
+
+def environment() -> dict[str, Any]:
+    return {
+        "hostname": socket.gethostname(),
+        "platform": platform.platform(),
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+        "stresspoes": package_version("stresspoes"),
+        "httpx": package_version("httpx"),
+    }
+
+
+class Results:
+    def __init__(self, filename: str | None, append: bool = False):
+        self._file = open(filename, "a" if append else "w") if filename else None
+
+    def __enter__(self) -> "Results":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write(self, record: dict[str, Any]):
+        if self._file is not None:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def round(self, **record: Any):
+        self._write({"type": "round", **record})
+
+    def summary(self, **record: Any):
+        self._write({"type": "summary", **record})
+
+    def sweep(self, **record: Any):
+        self._write({"type": "sweep", **record})
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def load_results(filename: str) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    rounds = []
+    summaries = []
+    with open(filename) as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("type") == "summary":
+                summaries.append(record)
+            elif record.get("type") == "round":
+                rounds.append(record)
+    return rounds, summaries
+
+
+def flatten(summary: dict[str, Any]) -> dict[str, float]:
+    values = {
+        metric: summary[metric]
+        for metric in METRICS
+        if isinstance(summary.get(metric), (int, float))
+    }
+    for row in summary.get("latency") or ():
+        for key, value in row.items():
+            if key.startswith("p") and key.endswith("_ms"):
+                values[f"{row['endpoint']} {key}"] = value
+    return values
+
+
+def direction(metric: str) -> int:
+    return METRICS.get(metric, -1)
+
+
+def compare(
+    baseline: dict[str, Any],
+    candidate: dict[str, Any],
+    thresholds: dict[str, float],
+    default: float,
+) -> list[dict[str, Any]]:
+    ours = flatten(baseline)
+    theirs = flatten(candidate)
+    rows = []
+    for metric in ours:
+        if metric not in theirs:
+            continue
+        before, after = ours[metric], theirs[metric]
+        change = (after - before) / before if before else 0.0
+        threshold = thresholds.get(metric, thresholds.get(metric.split()[-1], default))
+        rows.append(
+            {
+                "metric": metric,
+                "baseline": before,
+                "candidate": after,
+                "change": change,
+                "threshold": threshold,
+                "regression": -direction(metric) * change > threshold / 100,
+            }
+        )
+    return rows
+
+
+def parse_thresholds(specs: Iterable[str]) -> dict[str, float]:
+    thresholds = {}
+    for spec in specs:
+        metric, _, percentage = spec.rpartition("=")
+        thresholds[metric] = float(percentage)
+    return thresholds
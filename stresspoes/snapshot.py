@@ -0,0 +1,54 @@
+import json
+from typing import Any, Iterable, NamedTuple
+
+from xxhash import xxh3_64, xxh3_64_intdigest
+
+
+class Diff(NamedTuple):
+    added: list[dict[str, Any]]
+    removed: list[str]
+    modified: list[dict[str, Any]]
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.modified)
+
+
+def content_hash(obj: dict[str, Any]) -> int:
+    return xxh3_64_intdigest(
+        json.dumps(obj, sort_keys=True, separators=(",", ":")).encode()
+    )
+
+
+class Snapshot:
+    def __init__(self, fingerprint: bool = True):
+        self.fingerprint = fingerprint
+        self.fingerprints: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def __contains__(self, primary_key: str) -> bool:
+        return primary_key in self.fingerprints
+
+    def digest(self) -> str:
+        h = xxh3_64()
+        for pk in sorted(self.fingerprints):
+            h.update(f"{pk}\0{self.fingerprints[pk]}\0".encode())
+        return h.hexdigest()
+
+    def update(self, objects: Iterable[dict[str, Any]]) -> Diff:
+        fingerprints = {}
+        added = []
+        modified = []
+        for obj in objects:
+            pk = obj["primary_key"]
+            digest = content_hash(obj) if self.fingerprint else 0
+            fingerprints[pk] = digest
+            previous = self.fingerprints.get(pk)
+            if previous is None:
+                added.append(obj)
+            elif previous != digest:
+                modified.append(obj)
+        removed = [pk for pk in self.fingerprints if pk not in fingerprints]
+        self.fingerprints = fingerprints
+        return Diff(added, removed, modified)
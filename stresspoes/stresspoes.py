@@ -1,71 +1,128 @@
 #!/usr/bin/env python
 
-import base64
-import inspect
 import json
-import random
 import re
 import time
-from copy import deepcopy
-from functools import reduce
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import replace
 from typing import Any
 
+import tempfile
+from pathlib import Path
+
 import click
-import httpx
-import zstandard as zstd
-from dill import dumps, loads
-from octopoes_client import OctopoesClient
+from catalog import DatamapIndex
+from catalog import stats as datamap_stats
+from checkpoint import Interrupted
+from failures import Failures
+from fake_octopoes import parse_latency
+from generator import generate as generate_datamap
+from harness import StressConfig, run_stress
+from kat import SECTIONS, CorruptDatamap, DatamapReader, DatamapWriter
+from metrics import Metrics
+from octopoes_client import OctopoesClient, Pool
+from queue_monitor import QueueMonitor
+from reads import parse_read_mix
+from results import Results, load_results, parse_thresholds
+from results import compare as compare_results
+from sweep import exponents, step
+from sweep import table as sweep_table
 from term_image.image import from_file
-from xxhash import xxh3_128_hexdigest as xxh3
-
-MAGIC = 0xC0DECA7
-
-
-def get_queue_info() -> dict[str, Any]:
-    # Yeah yeah they are hard coded
-    username = "c9d88b19f88be9f73a1b82466739c326e95bcd1fdc585e550c"
-    password = "6a0af4576a947a4e0baa0d6e70eb045f9251167653b63ae797"
-    vhost = "kat"
-    queue_name = "octopoes"
-    auth_string = f"{username}:{password}"
-    auth_bytes = auth_string.encode("ascii")
-    base64_bytes = base64.b64encode(auth_bytes)
-    base64_auth = base64_bytes.decode("ascii")
-    headers = {"Authorization": f"Basic {base64_auth}"}
-    url = f"http://localhost:15672/api/queues/{vhost}/{queue_name}"
-    try:
-        with httpx.Client() as client:
-            response = client.get(url, headers=headers)
-        if response.status_code == 200:
-            queue_info = response.json()
-            return queue_info
+
+
+def aggregate(
+    runs: list[dict[str, Any]], workers: int, wall_time: float, config: StressConfig
+) -> str:
+    metrics = Metrics()
+    failures = Failures()
+    for run in runs:
+        if run["metrics"] is not None:
+            metrics.merge(run.pop("metrics"))
         else:
-            return {}
-    except Exception:
-        return {}
+            run.pop("metrics")
+        failures.merge(run.pop("failure_log"))
+    ops = sum(run["ops"] for run in runs)
+    rate = sum(run["ops_per_second"] for run in runs)
+    lines = [
+        f"{run["organisation"]}: {run["ops"]} ops, {run["ops_per_second"]:.1f} ops/s, {run["objects"]}/{run["expected_objects"]} objects, {run["wall_time"]:.2f}s ({"SUCCES" if run["success"] else "FAIL"})"
+        for run in runs
+    ]
+    lines.append(
+        f"total: {ops} ops over {len(runs)} organisations in {wall_time:.2f}s ({rate:.1f} ops/s submitting, {ops / wall_time:.1f} ops/s overall), {failures.total} failures"
+    )
+    if failures:
+        lines.append(failures.table())
+    latency = metrics.summary() if metrics.endpoints else None
+    if latency is not None:
+        if config.latency:
+            lines.append(metrics.table())
+        if config.latency_file:
+            metrics.export(config.latency_file)
+    with Results(config.results_file, append=True) as results:
+        results.summary(
+            environment=runs[0]["environment"] if runs else None,
+            url=config.url,
+            backend=config.backend,
+            datamap=runs[0]["datamap"] if runs else None,
+            multiplier=config.multiplier,
+            concurrency=config.concurrency,
+            batch_size=config.batch_size,
+            workers=workers,
+            organisations=len(runs),
+            rounds=max((run["rounds"] for run in runs), default=0),
+            ops=ops,
+            wall_time=wall_time,
+            submit_time=sum(run["submit_time"] for run in runs),
+            quiescence_time=max((run["quiescence_time"] for run in runs), default=0.0),
+            server_time=sum(run["server_time"] for run in runs),
+            ops_per_second=rate,
+            success=bool(runs) and all(run["success"] for run in runs),
+            failures=failures.summary(),
+            orgs=[
+                {key: value for key, value in run.items() if key != "environment"}
+                for run in runs
+            ],
+            latency=latency,
+        )
+    return "\n".join(lines)
 
 
-def merge_dicts(d1: dict[str, Any], d2: dict[str, Any]) -> dict[str, Any]:
-    return {
-        key: {**value, **d2[key]} if isinstance(value, dict) else value + d2[key]
-        for key, value in d1.items()
-    }
+def sizes(ctx: click.Context, param: click.Parameter, value: str | None):
+    if value is None:
+        return None
+    try:
+        values = [int(size) for size in value.split(",")]
+    except ValueError as e:
+        raise click.BadParameter(f"expected comma separated integers: {value}") from e
+    if any(size < 1 for size in values):
+        raise click.BadParameter(f"sizes must be positive: {value}")
+    return values
 
 
-def seek(d: dict[str, Any], key: str, regex: str) -> str | None:
-    if key in d and isinstance(d[key], str):
-        if re.search(regex, d[key]):
-            return d[key]
-    for v in d.values():
-        if isinstance(v, dict):
-            retval = seek(v, key, regex)
-            if retval is not None:
-                return retval
-    return None
+def read_mix_spec(ctx: click.Context, param: click.Parameter, value: str) -> str:
+    try:
+        parse_read_mix(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from e
+    return value
 
 
-def replace(d: dict[str, Any], source: str, target: str) -> dict[str, Any]:
-    return json.loads(json.dumps(d).replace(source, target))
+def require_rabbitmq(options: dict[str, Any]):
+    if options["backend"] == "octopoes" and not (
+        options["rabbitmq_user"] and options["rabbitmq_password"]
+    ):
+        raise click.UsageError(
+            "Queue monitoring needs RabbitMQ credentials: pass --rabbitmq-user and --rabbitmq-password or set STRESSPOES_RABBITMQ_USER and STRESSPOES_RABBITMQ_PASSWORD"
+        )
+
+
+def latency_spec(ctx: click.Context, param: click.Parameter, value: str) -> str:
+    try:
+        parse_latency(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from e
+    return value
 
 
 @click.group(
@@ -78,16 +135,58 @@ def replace(d: dict[str, Any], source: str, target: str) -> dict[str, Any]:
 @click.option("-u", "--url", default="http://localhost:8001", help="Octopoes base url")
 @click.option("-o", "--org", default="0", help="Orginization")
 @click.option("-s", "--silent", is_flag=True, help="Silent")
+@click.option(
+    "-p",
+    "--page-size",
+    default=1000,
+    type=click.IntRange(min=1),
+    help="Objects and origins per listing request",
+)
+@click.option("-P", "--prefetch", is_flag=True, help="Prefetch the next listing page")
+@click.option(
+    "--max-connections",
+    default=100,
+    type=click.IntRange(min=1),
+    help="Connections shared by all clients of a run",
+)
+@click.option(
+    "--max-keepalive",
+    default=20,
+    type=click.IntRange(min=0),
+    help="Idle keep-alive connections kept warm",
+)
+@click.option(
+    "--keepalive-expiry",
+    default=5.0,
+    type=click.FloatRange(min=0),
+    help="Seconds an idle keep-alive connection is kept",
+)
+@click.option("--http2", is_flag=True, help="Use HTTP/2 (requires the h2 package)")
 @click.pass_context
-def cli(ctx: click.Context, url: str, org: str, silent: bool):
+def cli(
+    ctx: click.Context,
+    url: str,
+    org: str,
+    silent: bool,
+    page_size: int,
+    prefetch: bool,
+    **pool: Any,
+):
     if not silent:
         image = from_file("stresspoes.jpg")
         image.draw()
         click.echo("Hello from stresspoes!")
-    oc = OctopoesClient(url, org)
+    try:
+        oc = OctopoesClient(url, org, pool=Pool(url, **pool))
+    except ImportError as e:
+        raise click.UsageError(str(e)) from e
+    ctx.call_on_close(oc.close)
     ctx.ensure_object(dict)
     ctx.obj["organisation"] = org
     ctx.obj["client"] = oc
+    ctx.obj["page_size"] = page_size
+    ctx.obj["prefetch"] = prefetch
+    ctx.obj["pool"] = pool
 
 
 @cli.command(help="Make an Octopoes session datamap image")
@@ -95,44 +194,197 @@ def cli(ctx: click.Context, url: str, org: str, silent: bool):
 @click.pass_context
 def datamap(ctx: click.Context, filename: str):
     oc = ctx.obj["client"]
-    oois = {obj["primary_key"]: obj for obj in oc.objects()["items"]}
-    affirmations = oc.origins(origin_type="affirmation")
-    declarations = oc.origins(origin_type="declaration")
-    observations = oc.origins(origin_type="observation")
-    datamap = {
-        "organisation": ctx.obj["organisation"],
-        "oois": oois,
-        "affirmations": affirmations,
-        "declarations": declarations,
-        "observations": observations,
-    }
-    with open(filename, "wb") as file:
-        payload = dumps(datamap)
-        file.write(
-            zstd.ZstdCompressor().compress(dumps((MAGIC, payload, xxh3(payload))))
-        )
+    page = ctx.obj["page_size"], ctx.obj["prefetch"]
+    with DatamapWriter(filename, ctx.obj["organisation"]) as writer:
+        for obj in oc.iter_objects(*page):
+            writer.add("oois", obj)
+        for origin_type in ("affirmation", "declaration", "observation"):
+            for origin in oc.iter_origins(*page, origin_type=origin_type):
+                writer.add(f"{origin_type}s", origin)
+
+
+@cli.command(help="Generate a synthetic datamap")
+@click.option(
+    "-n", "--networks", default=1, type=click.IntRange(min=1), help="Networks"
+)
+@click.option(
+    "-H",
+    "--hostnames",
+    default=10,
+    type=click.IntRange(min=0),
+    help="Declared root hostnames per network",
+)
+@click.option(
+    "-i", "--ips", default=1, type=click.IntRange(min=0), help="Addresses per hostname"
+)
+@click.option(
+    "-p",
+    "--ports",
+    default=3,
+    type=click.IntRange(min=0),
+    help="Open ports per address",
+)
+@click.option(
+    "-f",
+    "--fanout",
+    default=2,
+    type=click.IntRange(min=0),
+    help="Subdomains observed per hostname",
+)
+@click.option(
+    "-D",
+    "--depth",
+    default=1,
+    type=click.IntRange(min=0),
+    help="Subdomain levels below each root hostname",
+)
+@click.option(
+    "-A",
+    "--affirmations",
+    default=0.0,
+    type=click.FloatRange(min=0, max=1),
+    help="Probability that an observation is affirmed",
+)
+@click.option("--seed", default=0, help="Random seed for task ids and affirmations")
+@click.argument("filename", default="generated.kat")
+@click.pass_context
+def generate(ctx: click.Context, filename: str, **options: Any):
+    counts = generate_datamap(filename, ctx.obj["organisation"], **options)
+    click.echo(", ".join(f"{section}: {count}" for section, count in counts.items()))
 
 
 @cli.command(help="Dump Datamap")
+@click.option(
+    "-l",
+    "--jsonl",
+    is_flag=True,
+    help="Stream records as JSON Lines instead of one JSON document",
+)
+@click.option(
+    "--section",
+    "sections",
+    multiple=True,
+    type=click.Choice(SECTIONS),
+    help="Only dump these sections (with --jsonl)",
+)
 @click.argument("filename", default="datamap.kat")
 @click.pass_context
-def dump(ctx: click.Context, filename: str):
-    with open(filename, "rb") as file:
-        magic, datamap, checksum = loads(
-            zstd.ZstdDecompressor().decompress(file.read())
-        )
-    if magic != MAGIC or checksum != xxh3(datamap):
+def dump(ctx: click.Context, jsonl: bool, sections: tuple[str, ...], filename: str):
+    try:
+        reader = DatamapReader(filename)
+    except CorruptDatamap:
         click.echo(f"Datamap file {filename} seems corrupted.")
         return
-    else:
-        datamap = loads(datamap)
-    click.echo(json.dumps(datamap, indent=2))
+    with reader:
+        if not jsonl:
+            click.echo(json.dumps(reader.load(), indent=2))
+            return
+        for section in sections or SECTIONS:
+            for record in reader.records(section):
+                click.echo(json.dumps({"section": section, "record": record}))
+
+
+def open_index(filename: str, rebuild: bool = False) -> DatamapIndex:
+    try:
+        return DatamapIndex.open(DatamapReader(filename), rebuild)
+    except CorruptDatamap:
+        raise click.ClickException(f"Datamap file {filename} seems corrupted.")
+
+
+@cli.command(help="Summarise a datamap: types, methods, fan-out and depth")
+@click.option("-j", "--json", "as_json", is_flag=True, help="Print the summary as JSON")
+@click.argument("filename", default="datamap.kat")
+@click.pass_context
+def stats(ctx: click.Context, as_json: bool, filename: str):
+    try:
+        reader = DatamapReader(filename)
+    except CorruptDatamap:
+        raise click.ClickException(f"Datamap file {filename} seems corrupted.")
+    with reader:
+        summary = datamap_stats(reader)
+    if as_json:
+        click.echo(json.dumps(summary, indent=2))
+        return
+    click.echo(
+        f"{summary["organisation"]}: {summary["oois"]} oois, "
+        + ", ".join(f"{summary[section]} {section}" for section in SECTIONS[1:])
+    )
+    for name, counts in (
+        ("types", summary["types"]),
+        *summary["methods"].items(),
+    ):
+        click.echo(f"{name}:")
+        for key, count in counts.items():
+            click.echo(f"  {str(key):<40} {count:>10}")
+    fanout = summary["fanout"]
+    click.echo(
+        f"fan-out: min {fanout["min"]} p50 {fanout["p50"]} p90 {fanout["p90"]} p99 {fanout["p99"]} max {fanout["max"]}"
+    )
+    for bucket, count in fanout["buckets"].items():
+        click.echo(f"  {bucket:<40} {count:>10}")
+    click.echo(
+        f"depth: {summary["depth"]} over observations and references ({summary["roots"]} roots, {summary["reachable"]}/{summary["oois"]} oois reachable)"
+    )
+
+
+@cli.command(help="Show OOIs and the origins naming them by primary key")
+@click.option("--rebuild", is_flag=True, help="Rebuild the datamap index")
+@click.option("-f", "--filename", default="datamap.kat", help="Datamap file")
+@click.argument("primary_keys", nargs=-1, required=True)
+@click.pass_context
+def show(
+    ctx: click.Context, rebuild: bool, filename: str, primary_keys: tuple[str, ...]
+):
+    index = open_index(filename, rebuild)
+    with index.reader:
+        for pk in primary_keys:
+            if pk not in index:
+                raise click.ClickException(f"{pk} not in {filename}")
+            click.echo(json.dumps(index.show(pk), indent=2))
+
+
+@cli.command(help="List primary keys in a datamap matching a regular expression")
+@click.option("--rebuild", is_flag=True, help="Rebuild the datamap index")
+@click.option("-f", "--filename", default="datamap.kat", help="Datamap file")
+@click.option(
+    "-r", "--records", is_flag=True, help="Print matching records as JSON Lines"
+)
+@click.option(
+    "-n",
+    "--limit",
+    default=0,
+    type=click.IntRange(min=0),
+    help="Stop after this many matches",
+)
+@click.argument("pattern")
+@click.pass_context
+def grep(
+    ctx: click.Context,
+    rebuild: bool,
+    filename: str,
+    records: bool,
+    limit: int,
+    pattern: str,
+):
+    index = open_index(filename, rebuild)
+    try:
+        matches = sorted(index.grep(pattern))
+    except re.error as e:
+        raise click.BadParameter(str(e), param_hint="PATTERN")
+    with index.reader:
+        for pk in matches[: limit or None]:
+            click.echo(json.dumps(index.show(pk)) if records else pk)
 
 
 @cli.command(
     help="Stress Octopoes (warning: this may destroy your OpenKAT installation)"
 )
 @click.option("-d", "--dump", is_flag=True, default=False, help="Dump opbjects diff")
+@click.option(
+    "--verify-content",
+    is_flag=True,
+    help="Also compare object contents, ignoring scan profiles",
+)
 @click.option(
     "-x",
     "--noxterminate",
@@ -155,165 +407,473 @@ def dump(ctx: click.Context, filename: str):
 )
 @click.option("-t", "--threshold", default=0xF, help="Number of rounds after nulling")
 @click.option("-o", "--timeout", default=0.0, help="Relax the round")
+@click.option(
+    "--backoff-min",
+    default=0.1,
+    type=click.FloatRange(min=0),
+    help="First delay between idle convergence probes",
+)
+@click.option(
+    "--backoff-max",
+    default=1.0,
+    type=click.FloatRange(min=0),
+    help="Maximum delay between idle convergence probes",
+)
+@click.option(
+    "--jitter",
+    default=0.1,
+    type=click.FloatRange(min=0, max=1),
+    help="Relative random jitter on probe delays",
+)
+@click.option(
+    "-c",
+    "--concurrency",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Maximum number of origin saves in flight",
+)
+@click.option(
+    "-b",
+    "--batch-size",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Coalesce origin saves into batches of this size",
+)
+@click.option(
+    "-l",
+    "--linger",
+    default=0.05,
+    help="Maximum seconds an origin waits for its batch to fill",
+)
+@click.option(
+    "-R",
+    "--rate",
+    default=0.0,
+    type=click.FloatRange(min=0),
+    help="Open-loop mode: schedule origin saves at this rate per second (0: off)",
+)
+@click.option(
+    "--arrivals",
+    default="constant",
+    type=click.Choice(["constant", "poisson"]),
+    help="Open-loop inter-arrival distribution",
+)
+@click.option(
+    "--pipeline",
+    is_flag=True,
+    help="Submit each origin as soon as load_bulk confirms its source exists",
+)
+@click.option(
+    "--bits", is_flag=True, help="Time a bits recalculation after convergence"
+)
+@click.option(
+    "--read-mix",
+    default="",
+    callback=read_mix_spec,
+    help="Weighted reads during ingest, e.g. object=4,tree=1,query=1 (reads: object, object_history, load_bulk, tree, query, query_many, random, findings, findings_count_by_severity)",
+)
+@click.option(
+    "--readers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Concurrent readers for --read-mix",
+)
+@click.option(
+    "--read-sampling",
+    default="datamap",
+    type=click.Choice(["datamap", "random"]),
+    help="Sample read references from the datamap or via objects/random",
+)
+@click.option(
+    "--retries",
+    default=3,
+    type=click.IntRange(min=0),
+    help="Retries of a request failing with a transient error (429, 5xx, timeout, connection)",
+)
+@click.option(
+    "--retry-backoff",
+    default=0.1,
+    type=click.FloatRange(min=0),
+    help="First retry delay, doubled per retry",
+)
+@click.option(
+    "--retry-max",
+    default=2.0,
+    type=click.FloatRange(min=0),
+    help="Maximum retry delay",
+)
+@click.option(
+    "--checkpoint",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Periodically save the round state here, keeping the organisation when interrupted",
+)
+@click.option(
+    "--checkpoint-interval",
+    default=30.0,
+    type=click.FloatRange(min=0),
+    help="Seconds between checkpoints",
+)
+@click.option(
+    "--resume",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Continue the run saved in this checkpoint in its organisation",
+)
+@click.option(
+    "--churn",
+    default=0,
+    type=click.IntRange(min=0),
+    help="After convergence, retract and restore origins and OOIs this many times",
+)
+@click.option(
+    "--churn-share",
+    default=0.1,
+    type=click.FloatRange(min=0, max=1),
+    help="Share of observations retracted and of OOIs deleted per churn cycle",
+)
+@click.option(
+    "-f/-F",
+    "--fingerprint/--no-fingerprint",
+    default=True,
+    help="Also resubmit origins of objects whose content changed",
+)
+@click.option(
+    "-L", "--latency", is_flag=True, help="Report per-endpoint latency histograms"
+)
+@click.option(
+    "--latency-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Export per-endpoint latency summary (.json or .csv)",
+)
+@click.option(
+    "-r",
+    "--results",
+    "results_file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write per-round records and a run summary as JSON Lines",
+)
+@click.option(
+    "--rabbitmq-url",
+    default="http://localhost:15672",
+    help="RabbitMQ management API url",
+)
+@click.option(
+    "--rabbitmq-user",
+    envvar="STRESSPOES_RABBITMQ_USER",
+    show_default=False,
+    help="RabbitMQ management user",
+)
+@click.option(
+    "--rabbitmq-password",
+    envvar="STRESSPOES_RABBITMQ_PASSWORD",
+    show_default=False,
+    help="RabbitMQ management password",
+)
+@click.option("--vhost", default="kat", help="RabbitMQ virtual host")
+@click.option("--queue", default="octopoes", help="Octopoes event queue")
+@click.option(
+    "--queue-interval",
+    default=1.0,
+    type=click.FloatRange(min=0, min_open=True),
+    help="Seconds between queue samples",
+)
+@click.option(
+    "--queue-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Queue time series as JSON Lines (default: next to --results)",
+)
+@click.option(
+    "--backend",
+    default="octopoes",
+    type=click.Choice(["octopoes", "fake"]),
+    help="Stress a live Octopoes or the built-in in-process fake",
+)
+@click.option(
+    "--fake-latency",
+    default="0",
+    callback=latency_spec,
+    help="Fake response latency in ms: N, const:N, uniform:A,B, exp:MEAN, normal:MEAN,SD or lognormal:MEDIAN,SIGMA",
+)
+@click.option(
+    "--fake-error-rate",
+    default=0.0,
+    type=click.FloatRange(min=0, max=1),
+    help="Fraction of fake writes failing with a 500",
+)
+@click.option(
+    "--fake-throughput",
+    default=0,
+    type=click.IntRange(min=0),
+    help="Fake events processed per request (0: all)",
+)
+@click.option(
+    "-k",
+    "--orgs",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of organisations to stress simultaneously",
+)
+@click.option(
+    "-w",
+    "--workers",
+    default=0,
+    type=click.IntRange(min=0),
+    help="Worker processes for --orgs (0: one per organisation)",
+)
 @click.argument("filename", default="datamap.kat")
 @click.pass_context
 def stress(
     ctx: click.Context,
-    filename: str,
-    dump: bool,
-    noxterminate: bool,
-    multiplier: int,
-    noaffirm: bool,
-    threshold: int,
-    timeout: float,
+    orgs: int,
+    workers: int,
+    concurrency: int,
+    batch_size: int,
+    **options: Any,
 ):
-    oc = ctx.obj["client"]
-    with open(filename, "rb") as file:
-        magic, datamap, checksum = loads(
-            zstd.ZstdDecompressor().decompress(file.read())
+    if concurrency > 1 and batch_size > 1:
+        raise click.UsageError("--concurrency and --batch-size are mutually exclusive")
+    if options["rate"] > 0 and (concurrency > 1 or batch_size > 1):
+        raise click.UsageError(
+            "--rate is open-loop and excludes --concurrency and --batch-size"
         )
-    if magic != MAGIC or checksum != xxh3(datamap):
-        click.echo(f"Datamap file {filename} seems corrupted.")
+    if options["pipeline"] and (options["rate"] > 0 or batch_size > 1):
+        raise click.UsageError("--pipeline excludes --rate and --batch-size")
+    if options["resume"] and (orgs > 1 or options["backend"] == "fake"):
+        raise click.UsageError("--resume excludes --orgs and the fake backend")
+    require_rabbitmq(options)
+    if options["queue_file"] is None and options["results_file"]:
+        stem = options["results_file"].removesuffix(".jsonl")
+        options["queue_file"] = f"{stem}.queue.jsonl"
+    oc = ctx.obj["client"]
+    config = StressConfig(
+        url=oc.url,
+        organisation=oc.org,
+        page_size=ctx.obj["page_size"],
+        prefetch=ctx.obj["prefetch"],
+        **ctx.obj["pool"],
+        **options,
+    )
+    if orgs == 1:
+        try:
+            run_stress(config)
+        except Interrupted as e:
+            ctx.exit(128 + e.signum)
         return
-    else:
-        datamap = loads(datamap)
-    if datamap["organisation"] == oc.org:
-        organisation = (
-            oc.org
-            + f"-{"".join(chr(random.choice(range(97, 122))) for _ in range(16))}"
+    workers = workers or orgs
+    Results(config.results_file).close()
+    configs = [
+        replace(
+            config,
+            fresh=True,
+            checkpoint=config.checkpoint and f"{config.checkpoint}.{i}",
+            label=f"[{i}] ",
+            append_results=True,
+            latency_file=None,
+            queue_file=None,
         )
-        noc = OctopoesClient(oc.url, organisation)
-        print(f"organisation: {organisation}")
-        noc.node_create(organisation)
-        time.sleep(0.5)
-        noc = OctopoesClient(oc.url, organisation)
-    else:
-        organisation = oc.org
-        noc = oc
-    if multiplier > 1:
-        target = seek(datamap, "primary_key", r"^Network\|[^|]+$")
-        if target is not None:
-            target = target.split("|")[-1]
-            enriched = [
-                replace(deepcopy(datamap), target, f"{target}-{i}")
-                for i in range(multiplier - 1)
-            ]
-            datamap = merge_dicts(datamap, reduce(merge_dicts, enriched))
-            datamap["organisation"] = oc.org
-    print(f"declarations: {len(datamap["declarations"])}")
-    res = noc.save_many_declarations(
-        [{"ooi": datamap["oois"][decl["source"]]} for decl in datamap["declarations"]]
-    )
-    if res is not None:
-        print(f"FAIL({inspect.currentframe().f_lineno}): {json.dumps(res, indent=2)}")
-    res = noc.save_many_scan_profile(
-        [
-            datamap["oois"][decl["source"]]["scan_profile"]
-            for decl in datamap["declarations"]
-        ]
+        for i in range(orgs)
+    ]
+    start = time.perf_counter()
+    with (
+        (
+            QueueMonitor(
+                config.rabbitmq_url,
+                config.rabbitmq_user,
+                config.rabbitmq_password,
+                config.vhost,
+                config.queue,
+                config.queue_interval,
+                config.queue_file,
+            )
+            if config.backend == "octopoes"
+            else nullcontext()
+        ),
+        ProcessPoolExecutor(max_workers=workers) as pool,
+    ):
+        runs = [run for run in pool.map(run_stress, configs) if run is not None]
+    wall_time = time.perf_counter() - start
+    print(aggregate(runs, workers, wall_time, config))
+
+
+@cli.command(
+    help="Stress over growing datamaps and concurrency levels and fit scaling exponents"
+)
+@click.option(
+    "-m",
+    "--multipliers",
+    default="1,2,4",
+    callback=sizes,
+    help="Comma separated multipliers of FILENAME",
+)
+@click.option(
+    "-g",
+    "--generate",
+    callback=sizes,
+    help="Comma separated root hostname counts of generated datamaps (replaces FILENAME and --multipliers)",
+)
+@click.option(
+    "-c",
+    "--concurrency",
+    default="1",
+    callback=sizes,
+    help="Comma separated concurrency levels",
+)
+@click.option("-t", "--threshold", default=0xF, help="Number of rounds after nulling")
+@click.option(
+    "-r",
+    "--results",
+    "results_file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write every step and the fitted exponents as JSON Lines",
+)
+@click.option(
+    "--rabbitmq-url",
+    default="http://localhost:15672",
+    help="RabbitMQ management API url",
+)
+@click.option(
+    "--rabbitmq-user",
+    envvar="STRESSPOES_RABBITMQ_USER",
+    show_default=False,
+    help="RabbitMQ management user",
+)
+@click.option(
+    "--rabbitmq-password",
+    envvar="STRESSPOES_RABBITMQ_PASSWORD",
+    show_default=False,
+    help="RabbitMQ management password",
+)
+@click.option(
+    "--backend",
+    default="octopoes",
+    type=click.Choice(["octopoes", "fake"]),
+    help="Stress a live Octopoes or the built-in in-process fake",
+)
+@click.option(
+    "--fake-latency",
+    default="0",
+    callback=latency_spec,
+    help="Fake response latency in ms",
+)
+@click.option(
+    "--fake-throughput",
+    default=0,
+    type=click.IntRange(min=0),
+    help="Fake events processed per request (0: all)",
+)
+@click.argument("filename", default="datamap.kat")
+@click.pass_context
+def sweep(
+    ctx: click.Context,
+    multipliers: list[int],
+    generate: list[int] | None,
+    concurrency: list[int],
+    filename: str,
+    **options: Any,
+):
+    require_rabbitmq(options)
+    oc = ctx.obj["client"]
+    config = StressConfig(
+        url=oc.url,
+        organisation=oc.org,
+        page_size=ctx.obj["page_size"],
+        prefetch=ctx.obj["prefetch"],
+        **ctx.obj["pool"],
+        fresh=True,
+        noxterminate=True,
+        bits=True,
+        append_results=True,
+        **options,
     )
-    if res is not None:
-        print(f"FAIL({inspect.currentframe().f_lineno}): {json.dumps(res, indent=2)}")
-    time.sleep(1)
-    res = noc.scan_profiles_recalculate()
-    if res is not None:
-        print(f"FAIL({inspect.currentframe().f_lineno}): {json.dumps(res, indent=2)}")
-    objects = noc.objects()["items"]
-    print(f"init: {len(objects)}")
-    new_objects = objects
-    counter = 0
-    relaxer = 0
-    events = 1
-    times = []
-    operations = []
-    while new_objects or relaxer < threshold or events > 0:
-        ops = 1
-        begin = time.perf_counter_ns()
-        for obj in new_objects:
-            for prototype in filter(
-                lambda origin: origin["source"] == obj["primary_key"],
-                datamap["observations"],
-            ):
-                origin = deepcopy(prototype)
-                origin["result"] = [datamap["oois"][pk] for pk in origin["result"]]
-                res = noc.save_observation(origin)
-                if res is not None:
-                    print(
-                        f"FAIL({inspect.currentframe().f_lineno}): {json.dumps(res, indent=2)}"
-                    )
-                ops += 1
-            if not noaffirm:
-                for prototype in filter(
-                    lambda origin: origin["source"] == obj["primary_key"],
-                    datamap["affirmations"],
-                ):
-                    origin = deepcopy(prototype)
-                    res = noc.save_affirmations(
-                        {"ooi": datamap["oois"][origin["source"]]}
+    Results(config.results_file).close()
+    steps = []
+    with tempfile.TemporaryDirectory() as directory:
+        if generate is None:
+            plan = [(size, filename, size) for size in multipliers]
+        else:
+            plan = []
+            for size in generate:
+                generated = str(Path(directory) / f"{size}.kat")
+                generate_datamap(generated, oc.org, hostnames=size, seed=0)
+                plan.append((size, generated, 1))
+        failed = None
+        for size, datamap, multiplier in plan:
+            for level in concurrency:
+                run = run_stress(
+                    replace(
+                        config,
+                        filename=datamap,
+                        multiplier=multiplier,
+                        concurrency=level,
+                        label=f"[{size}x{level}] ",
                     )
-                    if res is not None:
-                        print(
-                            f"FAIL({inspect.currentframe().f_lineno}): {json.dumps(res, indent=2)}"
-                        )
-                    ops += 1
-        timediff = (time.perf_counter_ns() - begin) / 10e9
-        times.append(timediff)
-        operations.append(ops)
-        res = noc.scan_profiles_recalculate()
-        if res is not None:
+                )
+                if run is None:
+                    failed = f"{size}x{level}"
+                    break
+                steps.append(step(run, size))
+            if failed is not None:
+                break
+    if failed is not None:
+        print(f"Sweep step {failed} failed, later steps were skipped.")
+    print(sweep_table(steps))
+    with Results(config.results_file, append=True) as results:
+        results.sweep(steps=steps, exponents=exponents(steps), failed=failed)
+    if failed is not None:
+        ctx.exit(1)
+
+
+@cli.command(help="Compare stress results against a baseline for regressions")
+@click.option(
+    "-r",
+    "--regression",
+    "regressions",
+    multiple=True,
+    help="Allowed regression per metric in percent, e.g. ops_per_second=5",
+)
+@click.option(
+    "-t",
+    "--threshold",
+    default=10.0,
+    help="Allowed regression in percent for metrics without --regression",
+)
+@click.argument("baseline", type=click.Path(exists=True, dir_okay=False))
+@click.argument(
+    "candidates", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False)
+)
+@click.pass_context
+def compare(
+    ctx: click.Context,
+    regressions: tuple[str, ...],
+    threshold: float,
+    baseline: str,
+    candidates: tuple[str, ...],
+):
+    try:
+        thresholds = parse_thresholds(regressions)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--regression")
+    summaries = {}
+    for filename in (baseline, *candidates):
+        _, runs = load_results(filename)
+        if not runs:
+            raise click.ClickException(f"No run summary in {filename}")
+        summaries[filename] = runs[-1]
+    regressed = False
+    for candidate in candidates:
+        print(f"{baseline} -> {candidate}")
+        for key in ("datamap", "multiplier"):
+            if summaries[baseline].get(key) != summaries[candidate].get(key):
+                print(f"  warning: {key} differs between runs")
+        for row in compare_results(
+            summaries[baseline], summaries[candidate], thresholds, threshold
+        ):
+            mark = "REGRESSION" if row["regression"] else "ok"
             print(
-                f"FAIL({inspect.currentframe().f_lineno}): {json.dumps(res, indent=2)}"
+                f"  {row["metric"]:<50} {row["baseline"]:>12.4g} {row["candidate"]:>12.4g} {row["change"]:>+8.1%} {mark}"
             )
-        newer_objects = noc.objects()["items"]
-        new_objects = [obj for obj in newer_objects if obj not in objects]
-        if len(new_objects) == 0:
-            relaxer += 1
-        else:
-            relaxer = 0
-        objects = deepcopy(newer_objects)
-        events = get_queue_info().get("messages", -1)
-        print(f"{counter}: {len(objects)} ({ops}/{events}: {timediff}s)")
-        time.sleep(timeout)
-        counter += 1
-    objects = noc.objects()["items"]
-    pks = [obj["primary_key"] for obj in objects]
-    if len(datamap["oois"]) == len(objects) and all(
-        ref in pks for ref in datamap["oois"]
-    ):
-        print(f"SUCCES: {len(datamap["oois"])} in ({sum(operations)}: {sum(times)})s")
-    else:
-        print(
-            f"FAIL: {len(datamap["oois"])} ({datamap["organisation"]}) != {len(objects)} ({organisation}) in ({sum(operations)}: {sum(times)}s)"
-        )
-        if dump:
-            counter = 0
-            for obj in datamap["oois"]:
-                if obj not in pks:
-                    print(f"--> {obj}")
-                    counter += 1
-            if counter > 0:
-                print(f"diff: {counter}")
-            counter = 0
-            for obj in pks:
-                if obj not in datamap["oois"]:
-                    print(f"<-- {obj}")
-                    counter += 1
-            if counter > 0:
-                print(f"diff: {counter}")
-    print(
-        f"affirmations: {len(noc.origins(origin_type="affirmation"))}/{len(datamap["affirmations"])}"
-    )
-    print(
-        f"declarations: {len(noc.origins(origin_type="declaration"))}/{len(datamap["declarations"])}"
-    )
-    print(
-        f"observations: {len(noc.origins(origin_type="observation"))}/{len(datamap["observations"])}"
-    )
-    print(f"inferences: {len(noc.origins(origin_type="inference"))}")
-    print(f"nibblets: {len(noc.origins(origin_type="nibblet"))}")
-    print(f"origins: {len(noc.origins())}")
-    if noxterminate:
-        noc.node_delete(organisation)
+            regressed |= row["regression"]
+    if regressed:
+        ctx.exit(1)
 
 
 if __name__ == "__main__":
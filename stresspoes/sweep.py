@@ -0,0 +1,77 @@
+import math
+from typing import Any
+
+PHASES = ("declarations", "ingest", "recalculate", "bits", "quiescence")
+SUPERLINEAR = 1.2
+
+
+def growth_exponent(sizes: list[float], values: list[float]) -> float | None:
+    points = [
+        (math.log(size), math.log(value))
+        for size, value in zip(sizes, values)
+        if size > 0 and value > 0
+    ]
+    if len({x for x, _ in points}) < 2:
+        return None
+    mx = sum(x for x, _ in points) / len(points)
+    my = sum(y for _, y in points) / len(points)
+    sxx = sum((x - mx) ** 2 for x, _ in points)
+    sxy = sum((x - mx) * (y - my) for x, y in points)
+    return sxy / sxx
+
+
+def step(summary: dict[str, Any], size: int) -> dict[str, Any]:
+    return {
+        "size": size,
+        "oois": summary["datamap"]["oois"],
+        "concurrency": summary["concurrency"],
+        **{phase: summary["phases"].get(phase) for phase in PHASES},
+        "ops_per_second": summary["ops_per_second"],
+        "success": summary["success"],
+    }
+
+
+def exponents(steps: list[dict[str, Any]]) -> dict[int, dict[str, float | None]]:
+    fits = {}
+    for concurrency in sorted({step["concurrency"] for step in steps}):
+        rows = [step for step in steps if step["concurrency"] == concurrency]
+        fits[concurrency] = {
+            phase: growth_exponent(
+                [row["oois"] for row in rows if row[phase] is not None],
+                [row[phase] for row in rows if row[phase] is not None],
+            )
+            for phase in (*PHASES, "ops_per_second")
+        }
+    return fits
+
+
+def table(steps: list[dict[str, Any]]) -> str:
+    def seconds(value: float | None) -> str:
+        return "-" if value is None else f"{value:.3f}"
+
+    header = f"{"size":>8} {"oois":>10} {"conc":>5} " + " ".join(
+        f"{phase:>12}" for phase in PHASES
+    )
+    lines = [header + f" {"ops/s":>10}"]
+    for row in steps:
+        lines.append(
+            f"{row["size"]:>8} {row["oois"]:>10} {row["concurrency"]:>5} "
+            + " ".join(f"{seconds(row[phase]):>12}" for phase in PHASES)
+            + f" {row["ops_per_second"]:>10.1f}"
+            + ("" if row["success"] else " FAIL")
+        )
+    for concurrency, fit in exponents(steps).items():
+        lines.append(
+            f"growth (c={concurrency}): "
+            + ", ".join(
+                f"{phase} n^{exponent:.2f}"
+                + (
+                    " (superlinear)"
+                    if phase in PHASES and exponent > SUPERLINEAR
+                    else ""
+                )
+                for phase, exponent in fit.items()
+                if exponent is not None
+            )
+        )
+    return "\n".join(lines)
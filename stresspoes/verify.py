@@ -0,0 +1,194 @@
+from collections import Counter
+from typing import Any, Iterable
+
+from compact import ORIGINS, CompactDatamap
+from snapshot import content_hash
+
+DERIVED = ("inference", "nibblet")
+VOLATILE = ("scan_profile", "user_id")
+# replayed without their method, so the server picks one
+UNMETHODED = frozenset({"affirmation", "declaration"})
+SAMPLE = 10
+
+OriginKey = tuple[str | None, str | None, str]
+
+
+def origin_key(
+    origin_type: str, method: str | None, source_method: str | None, source: str
+) -> OriginKey:
+    if origin_type in UNMETHODED:
+        return None, None, source
+    return method, source_method, source
+
+
+def stable_hash(obj: dict[str, Any]) -> int:
+    return content_hash({k: v for k, v in obj.items() if k not in VOLATILE})
+
+
+def sample(values: Iterable[Any], limit: int | None = SAMPLE) -> list[Any]:
+    return sorted(values, key=str)[:limit]
+
+
+class Section:
+    def __init__(self, name: str, expected: int, actual: int):
+        self.name = name
+        self.expected = expected
+        self.actual = actual
+        self.missing: list[Any] = []
+        self.extra: list[Any] = []
+        self.mismatched: list[Any] = []
+
+    @property
+    def ok(self) -> bool:
+        return not (self.missing or self.extra or self.mismatched)
+
+    def summary(self, limit: int | None = SAMPLE) -> dict[str, Any]:
+        return {
+            "expected": self.expected,
+            "actual": self.actual,
+            "missing": len(self.missing),
+            "extra": len(self.extra),
+            "mismatched": len(self.mismatched),
+            "samples": {
+                "missing": sample(self.missing, limit),
+                "extra": sample(self.extra, limit),
+                "mismatched": sample(self.mismatched, limit),
+            },
+        }
+
+
+class Verification:
+    """Hashed-set comparison of the expected datamap with an Octopoes graph.
+
+    OOIs are compared by primary key and, optionally, by a content hash
+    that ignores scan profiles. Declarations, observations and affirmations
+    are keyed like Octopoes origin ids, by (method, source method, source),
+    and compared by result set. Inferences and
+    nibblets are not in the datamap, so they are only checked for
+    dangling sources and results.
+    """
+
+    def __init__(
+        self,
+        datamap: CompactDatamap,
+        sections: Iterable[str] = ORIGINS,
+        content: bool = False,
+    ):
+        self.datamap = datamap
+        self.origin_sections = tuple(sections)
+        self.content = content
+        self.sections: dict[str, Section] = {}
+        self.origin_counts: Counter[str] = Counter()
+
+    @property
+    def ok(self) -> bool:
+        return all(section.ok for section in self.sections.values())
+
+    def expected_origins(self, section: str) -> dict[OriginKey, frozenset[str]]:
+        table = self.datamap.tables[section]
+        keys = self.datamap.keys
+        strings = self.datamap.strings.values
+        expected = {}
+        for i in range(len(table)):
+            results = table.results[table.offsets[i] : table.offsets[i + 1]]
+            key = origin_key(
+                table.origin_type,
+                strings[table.methods[i]],
+                strings[table.source_methods[i]],
+                keys[table.sources[i]],
+            )
+            expected[key] = frozenset(keys[r] for r in results)
+        return expected
+
+    def run(
+        self, objects: Iterable[dict[str, Any]], origins: Iterable[dict[str, Any]]
+    ) -> "Verification":
+        actual: dict[str, int] = {
+            obj["primary_key"]: stable_hash(obj) if self.content else 0
+            for obj in objects
+        }
+        section = self.sections["oois"] = Section(
+            "oois", len(self.datamap), len(actual)
+        )
+        section.missing = [pk for pk in self.datamap if pk not in actual]
+        section.extra = [pk for pk in actual if pk not in self.datamap]
+        if self.content:
+            section.mismatched = [
+                pk
+                for pk in self.datamap
+                if pk in actual and stable_hash(self.datamap.ooi(pk)) != actual[pk]
+            ]
+        found: dict[str, dict[OriginKey, frozenset[str]]] = {
+            origin_type: {} for origin_type in (*(s[:-1] for s in ORIGINS), *DERIVED)
+        }
+        for origin in origins:
+            self.origin_counts[origin["origin_type"]] += 1
+            key = origin_key(
+                origin["origin_type"],
+                origin["method"],
+                origin.get("source_method"),
+                origin["source"],
+            )
+            found.setdefault(origin["origin_type"], {})[key] = frozenset(
+                origin["result"]
+            )
+        for name in self.origin_sections:
+            expected = self.expected_origins(name)
+            got = found[name[:-1]]
+            section = self.sections[name] = Section(name, len(expected), len(got))
+            section.missing = [key for key in expected if key not in got]
+            section.extra = [key for key in got if key not in expected]
+            section.mismatched = [
+                {
+                    "origin": key,
+                    "missing": sample(results - got[key]),
+                    "extra": sample(got[key] - results),
+                }
+                for key, results in expected.items()
+                if key in got and got[key] != results
+            ]
+        for origin_type in DERIVED:
+            got = found[origin_type]
+            section = self.sections[f"{origin_type}s"] = Section(
+                f"{origin_type}s", len(got), len(got)
+            )
+            section.mismatched = [
+                {
+                    "origin": key,
+                    "dangling": sample(
+                        pk for pk in (key[-1], *results) if pk not in actual
+                    ),
+                }
+                for key, results in got.items()
+                if key[-1] not in actual or not results <= actual.keys()
+            ]
+        return self
+
+    def summary(self, limit: int | None = SAMPLE) -> dict[str, Any]:
+        return {
+            "ok": self.ok,
+            **{name: section.summary(limit) for name, section in self.sections.items()},
+        }
+
+    def table(self) -> str:
+        lines = [
+            f"{"section":<14} {"expected":>10} {"actual":>10} {"missing":>9} {"extra":>9} {"mismatched":>10}"
+        ]
+        for name, section in self.sections.items():
+            lines.append(
+                f"{name:<14} {section.expected:>10} {section.actual:>10} {len(section.missing):>9} {len(section.extra):>9} {len(section.mismatched):>10}"
+            )
+        return "\n".join(lines)
+
+    def details(self) -> list[str]:
+        lines = []
+        for name, section in self.sections.items():
+            for marker, values in (
+                ("-->", section.missing),
+                ("<--", section.extra),
+                ("!=", section.mismatched),
+            ):
+                lines.extend(
+                    f"{name} {marker} {value}" for value in sample(values, None)
+                )
+        return lines
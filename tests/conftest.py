@@ -0,0 +1,31 @@
+from pathlib import Path
+
+import pytest
+
+from compact import CompactDatamap
+from harness import StressConfig
+from kat import DatamapReader
+
+DATAMAP = str(Path(__file__).parent.parent / "datamap.kat")
+
+
+@pytest.fixture
+def config() -> StressConfig:
+    return StressConfig(
+        url="http://fake",
+        organisation="test",
+        filename=DATAMAP,
+        backend="fake",
+        fresh=True,
+        threshold=3,
+        backoff_min=0.001,
+        backoff_max=0.01,
+        retry_backoff=0.001,
+        retry_max=0.01,
+    )
+
+
+@pytest.fixture(scope="session")
+def datamap() -> CompactDatamap:
+    with DatamapReader(DATAMAP) as reader:
+        return CompactDatamap.from_reader(reader)
@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from catalog import DatamapIndex, stats
+from conftest import DATAMAP
+from kat import DatamapReader
+from test_kat import write
+
+
+@pytest.fixture
+def reader(tmp_path):
+    with DatamapReader(DATAMAP) as v1:
+        datamap = v1.load()
+    filename = str(tmp_path / "datamap.kat")
+    write(filename, datamap, chunk_size=16)
+    with DatamapReader(filename) as reader:
+        yield reader
+
+
+def test_show(reader: DatamapReader):
+    index = DatamapIndex.open(reader)
+    observation = next(reader.records("observations"))
+    source = index.show(observation["source"])
+    assert source["ooi"]["primary_key"] == observation["source"]
+    assert observation in source["source_of"]["observations"]
+    result = index.show(observation["result"][0])
+    assert observation in result["result_of"]["observations"]
+    assert observation["result"][0] in index
+
+
+def test_show_unknown(reader: DatamapReader):
+    index = DatamapIndex.open(reader)
+    assert "Network|nowhere" not in index
+    found = index.show("Network|nowhere")
+    assert found["ooi"] is None
+    assert not any(found["source_of"].values())
+    assert not any(found["result_of"].values())
+
+
+def test_grep(reader: DatamapReader):
+    index = DatamapIndex.open(reader)
+    networks = sorted(index.grep(r"^Network\|"))
+    assert networks
+    assert networks == sorted(
+        obj["primary_key"]
+        for obj in reader.records("oois")
+        if obj["object_type"] == "Network"
+    )
+    assert list(index.grep("no such key")) == []
+
+
+def test_index_is_cached(reader: DatamapReader):
+    index = DatamapIndex.open(reader)
+    filename = f"{reader.filename}.idx"
+    assert os.path.exists(filename)
+    cached = DatamapIndex.open(reader)
+    assert cached.oois == index.oois
+    assert cached.origins == index.origins
+
+
+def test_unreadable_index_is_rebuilt(reader: DatamapReader):
+    filename = f"{reader.filename}.idx"
+    with open(filename, "wb") as file:
+        file.write(b"stale")
+    index = DatamapIndex.open(reader)
+    assert len(index.oois) == reader.count("oois")
+
+
+def test_stats(reader: DatamapReader):
+    summary = stats(reader)
+    assert summary["oois"] == sum(summary["types"].values()) == 193
+    assert summary["observations"] == sum(summary["methods"]["observations"].values())
+    assert summary["depth"] > 0
+    assert 0 < summary["roots"] <= summary["reachable"] <= summary["oois"]
@@ -0,0 +1,34 @@
+from dataclasses import replace
+
+from churn import settle
+from convergence import Convergence
+from fake_octopoes import FakeOctopoes
+from failures import Failures
+from harness import StressConfig, run_stress
+from octopoes_client import OctopoesClient
+from queue_monitor import QueueMonitor
+
+
+def test_churn_restores_the_graph(config: StressConfig):
+    summary = run_stress(replace(config, churn=2, churn_share=0.2))
+    assert summary["success"]
+    churn = summary["churn"]
+    assert churn["restored"]
+    for cycle in churn["cycles"]:
+        assert cycle["deleted"] > 0
+        assert cycle["trough"] < cycle["objects"]
+        assert cycle["restored"] == cycle["objects"] == summary["expected_objects"]
+        assert cycle["restore_time"] > 0
+
+
+def test_settle_probes_a_quiet_convergence():
+    fake = FakeOctopoes()
+    client = OctopoesClient("http://fake", "test", transport=fake.transport())
+    client.node_create("test")
+    client.save_declaration(
+        {"ooi": {"object_type": "Network", "primary_key": "Network|a", "name": "a"}}
+    )
+    convergence = Convergence(0, minimum=0.0)
+    assert convergence.quiet
+    monitor = QueueMonitor("http://fake", transport=fake.transport())
+    assert settle(client, monitor, convergence, 0, Failures()) == 1
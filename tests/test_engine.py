@@ -0,0 +1,29 @@
+import asyncio
+
+from engine import OpenLoop, submit_open_loop
+from fake_octopoes import FakeOctopoes
+from failures import RequestFailed
+from octopoes_client import AsyncOctopoesClient
+
+
+def test_open_loop_behind_is_dispatch_lag():
+    fake = FakeOctopoes(latency="200")
+    results = []
+    schedule = OpenLoop(1000.0)
+    calls = [("load_bulk", ["Network|internet"])] * 20
+
+    async def run():
+        async with AsyncOctopoesClient(
+            "http://fake", "test", transport=fake.async_transport()
+        ) as client:
+            return await submit_open_loop(
+                client, calls, schedule, lambda method, res: results.append(res)
+            )
+
+    sent, behind = asyncio.run(run())
+    assert sent == 20
+    assert not any(isinstance(res, RequestFailed) for res in results)
+    # responses take 200ms, but every call is dispatched on schedule
+    assert schedule.latency.summary()["p50_ms"] >= 200
+    assert behind < 0.1
+    assert schedule.behind == behind
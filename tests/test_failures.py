@@ -0,0 +1,169 @@
+import itertools
+from dataclasses import replace
+
+import httpx
+import pytest
+
+from failures import (
+    Failures,
+    RequestFailed,
+    RetryPolicy,
+    classify_error,
+    classify_status,
+)
+from harness import StressConfig, run_stress
+from octopoes_client import OctopoesClient
+
+
+@pytest.mark.parametrize(
+    "status, category",
+    [
+        (200, None),
+        (204, None),
+        (400, "client"),
+        (404, "not_found"),
+        (409, "conflict"),
+        (422, "invalid"),
+        (429, "throttled"),
+        (500, "server"),
+        (502, "unavailable"),
+        (503, "unavailable"),
+        (504, "unavailable"),
+    ],
+)
+def test_classify_status(status: int, category: str | None):
+    assert classify_status(status) == category
+
+
+def test_classify_error():
+    request = httpx.Request("GET", "http://fake")
+    assert classify_error(httpx.ReadTimeout("", request=request)) == "timeout"
+    assert classify_error(httpx.ConnectError("", request=request)) == "connection"
+    assert classify_error(ValueError()) == "decode"
+    assert classify_error(httpx.DecodingError("")) == "http"
+
+
+def test_retry_after():
+    retry = RetryPolicy(base=0.1, cap=2.0, jitter=0.0)
+    assert retry.delay(0, "1.5") == 1.5
+    assert retry.delay(0, "60") == 2.0
+    assert retry.delay(0, "-1") == 0.0
+    # HTTP dates are not parsed and fall back to exponential backoff
+    assert retry.delay(2, "Wed, 21 Oct 2015 07:28:00 GMT") == 0.4
+    assert [retry.delay(attempt) for attempt in range(6)] == [
+        0.1,
+        0.2,
+        0.4,
+        0.8,
+        1.6,
+        2.0,
+    ]
+
+
+def client(statuses: list[int], failures: Failures, attempts: int = 4):
+    responses = iter(statuses)
+    seen = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        status = next(responses)
+        seen.append(status)
+        return httpx.Response(status, json={}, headers={"Retry-After": "0"})
+
+    return (
+        OctopoesClient(
+            "http://fake",
+            "test",
+            transport=httpx.MockTransport(handle),
+            retry=RetryPolicy(attempts, seed=0),
+            failures=failures,
+        ),
+        seen,
+    )
+
+
+def test_retries_until_success():
+    failures = Failures()
+    octopoes, seen = client([503, 429, 500, 200], failures)
+    assert octopoes.health() == {}
+    assert seen == [503, 429, 500, 200]
+    assert failures.total == 0
+    assert failures.retries == {
+        ("GET /health", "unavailable"): 1,
+        ("GET /health", "throttled"): 1,
+        ("GET /health", "server"): 1,
+    }
+
+
+def test_retries_run_out():
+    failures = Failures()
+    octopoes, seen = client([500, 500, 500], failures, attempts=3)
+    with pytest.raises(RequestFailed) as e:
+        octopoes.health()
+    assert (e.value.category, e.value.status) == ("server", 500)
+    assert len(seen) == 3
+    assert sum(failures.retries.values()) == 2
+
+
+def test_client_errors_are_not_retried():
+    failures = Failures()
+    octopoes, seen = client([404, 200], failures)
+    with pytest.raises(RequestFailed) as e:
+        octopoes.health()
+    assert e.value.category == "not_found"
+    assert seen == [404]
+    assert not failures
+
+
+def test_merge():
+    first, second = Failures(), Failures()
+    first.record("POST /observations", "server", "first")
+    second.record("POST /observations", "server", "second")
+    second.retry("GET /objects", "timeout")
+    first.merge(second)
+    assert first.total == 2
+    assert first.summary() == [
+        {
+            "endpoint": "GET /objects",
+            "category": "timeout",
+            "failures": 0,
+            "retries": 1,
+            "detail": "",
+        },
+        {
+            "endpoint": "POST /observations",
+            "category": "server",
+            "failures": 2,
+            "retries": 0,
+            "detail": "first",
+        },
+    ]
+
+
+def failing(monkeypatch, method: str, every: int):
+    original = getattr(OctopoesClient, method)
+    calls = itertools.count(1)
+
+    def wrapper(self, *args, **kwargs):
+        if next(calls) % every == 0:
+            raise RequestFailed(f"GET {method}", "server", 500, "probe failed")
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(OctopoesClient, method, wrapper)
+
+
+def test_failed_probes_are_idle_rounds(config: StressConfig, monkeypatch):
+    failing(monkeypatch, "count_objects", 3)
+    failing(monkeypatch, "iter_objects", 3)
+    summary = run_stress(replace(config, threshold=8))
+    assert summary["success"]
+    endpoints = {row["endpoint"] for row in summary["failures"]}
+    assert {"GET count_objects", "GET iter_objects"} <= endpoints
+
+
+def test_unlistable_graph_fails_verification(config: StressConfig, monkeypatch):
+    failing(monkeypatch, "iter_objects", 1)
+    summary = run_stress(replace(config, threshold=1))
+    assert summary is not None
+    assert not summary["success"]
+    assert summary["verification"] is None
+    assert summary["failure_log"].total > 0
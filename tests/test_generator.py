@@ -0,0 +1,59 @@
+from collections import Counter
+
+from generator import generate
+from kat import DatamapReader
+
+
+def read(filename: str) -> tuple[dict, str]:
+    with DatamapReader(filename) as reader:
+        return reader.load(), reader.checksum
+
+
+def test_counts(tmp_path):
+    filename = str(tmp_path / "generated.kat")
+    counts = generate(filename, "test", hostnames=2, ports=3, fanout=2, depth=1)
+    # each root hostname has two subdomains; every hostname brings an address,
+    # an A record, a resolution and two objects per port, and services are shared
+    hostnames = 2 * (1 + 2)
+    assert counts == {
+        "oois": 1 + hostnames * (4 + 2 * 3) + 3,
+        "declarations": 1 + 2,
+        "observations": hostnames * 2,
+        "affirmations": 0,
+    }
+    datamap, _ = read(filename)
+    assert datamap["organisation"] == "test"
+    assert {section: len(datamap[section]) for section in counts} == counts
+    assert len({origin["task_id"] for origin in datamap["observations"]}) == 12
+    for origin in datamap["observations"]:
+        assert origin["source"] in datamap["oois"]
+        assert all(pk in datamap["oois"] for pk in origin["result"])
+
+
+def test_seeded(tmp_path):
+    files = [str(tmp_path / f"{name}.kat") for name in ("a", "b", "c")]
+    for filename, seed in zip(files, (1, 1, 2)):
+        generate(filename, "test", hostnames=5, affirmations=0.5, seed=seed)
+    a, b, c = (read(filename) for filename in files)
+    assert a == b
+    assert a[0]["oois"] == c[0]["oois"]
+    assert a[0]["observations"] != c[0]["observations"]
+
+
+def test_affirmations_spread_over_observations(tmp_path):
+    filename = str(tmp_path / "generated.kat")
+    counts = generate(filename, "test", hostnames=20, affirmations=0.5, seed=0)
+    datamap, _ = read(filename)
+    observed = {
+        pk: origin["method"]
+        for origin in datamap["observations"]
+        for pk in origin["result"]
+    }
+    methods = Counter(origin["method"] for origin in datamap["affirmations"])
+    assert 0 < counts["affirmations"] < counts["observations"]
+    assert set(methods) == {"kat_dns_normalize", "kat_nmap_normalize"}
+    for origin in datamap["affirmations"]:
+        assert origin["result"] == [origin["source"]]
+        assert origin["source"] in observed
+    every = generate(filename, "test", hostnames=2, affirmations=1.0)
+    assert every["affirmations"] == every["observations"]
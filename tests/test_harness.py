@@ -0,0 +1,117 @@
+import re
+import signal
+from dataclasses import replace
+
+import pytest
+
+import harness
+from checkpoint import Interrupted
+from fake_octopoes import FakeOctopoes
+from compact import CompactDatamap
+from harness import StressConfig, run_stress
+
+
+def test_real_capture_verifies_on_fake(
+    config: StressConfig, datamap: CompactDatamap, capsys
+):
+    summary = run_stress(config)
+    assert summary["success"]
+    # observations are only materialised once they are submitted
+    init = int(re.search(r"^init: (\d+)$", capsys.readouterr().out, re.M)[1])
+    assert init < summary["expected_objects"]
+    assert summary["rounds"] > 3
+    assert summary["objects"] == summary["expected_objects"] == 193
+    assert summary["verification"]["ok"]
+    assert summary["origins"]["observation"] == summary["datamap"]["observations"]
+    # declarations of the same OOI share a single origin
+    assert summary["origins"]["declaration"] == len(
+        set(datamap.sources("declarations"))
+    )
+    assert not summary["failures"]
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"pipeline": True},
+        {"pipeline": True, "concurrency": 4},
+        {"rate": 1000.0},
+        {"rate": 1000.0, "arrivals": "poisson"},
+        {"concurrency": 8},
+        {"batch_size": 16},
+        {"noaffirm": False},
+        {"verify_content": True},
+        {"multiplier": 2},
+    ],
+    ids=str,
+)
+def test_submission_modes(config: StressConfig, options: dict):
+    summary = run_stress(replace(config, **options))
+    assert summary["success"]
+    assert summary["objects"] == summary["expected_objects"]
+    if options.get("pipeline"):
+        assert summary["pipeline"]["unresolved"] == 0
+        assert summary["pipeline"]["submitted"] == summary["pipeline"]["sources"]
+        assert summary["pipeline"]["checks"] > 1
+        assert summary["pipeline"]["visibility"]["count"] > 0
+    if options.get("rate"):
+        assert summary["open_loop"] is not None
+
+
+def test_nothing_submitted(config: StressConfig, monkeypatch):
+    monkeypatch.setattr(harness, "submit", lambda *args: 0)
+    summary = run_stress(config)
+    assert not summary["success"]
+    assert summary["objects"] < summary["expected_objects"]
+    assert summary["origins"]["observation"] == 0
+
+
+def test_error_injection_is_retried(config: StressConfig):
+    summary = run_stress(replace(config, fake_error_rate=0.2, retries=10))
+    assert summary["success"]
+    assert sum(failure["retries"] for failure in summary["failures"]) > 0
+    assert sum(failure["failures"] for failure in summary["failures"]) == 0
+
+
+def test_error_injection_without_retries_is_reported(config: StressConfig):
+    summary = run_stress(replace(config, fake_error_rate=0.5, retries=0))
+    assert summary is not None
+    assert sum(failure["failures"] for failure in summary["failures"]) > 0
+    assert {failure["category"] for failure in summary["failures"]} == {"server"}
+
+
+def test_checkpoint_and_resume(config: StressConfig, tmp_path, monkeypatch):
+    fake = None
+
+    def shared(*args, **kwargs):
+        nonlocal fake
+        if fake is None:
+            fake = FakeOctopoes(*args, **kwargs)
+        return fake
+
+    def interrupt(*args):
+        raise Interrupted(signal.SIGTERM)
+
+    monkeypatch.setattr(harness, "FakeOctopoes", shared)
+    monkeypatch.setattr(harness, "submit", interrupt)
+    checkpoint = str(tmp_path / "checkpoint.json")
+    with pytest.raises(Interrupted):
+        run_stress(replace(config, checkpoint=checkpoint))
+    state = harness.Checkpoint.load(checkpoint)
+    assert state["seeded"]
+    assert state["rounds"] == 0
+    organisation = state["organisation"]
+    assert organisation in fake.nodes
+
+    monkeypatch.undo()
+    monkeypatch.setattr(harness, "FakeOctopoes", shared)
+    summary = run_stress(replace(config, fresh=False, resume=checkpoint))
+    assert summary["success"]
+    assert summary["organisation"] == organisation
+    assert summary["objects"] == summary["expected_objects"]
+
+
+def test_corrupt_datamap(config: StressConfig, tmp_path):
+    corrupt = tmp_path / "corrupt.kat"
+    corrupt.write_bytes(b"not a datamap")
+    assert run_stress(replace(config, filename=str(corrupt))) is None
@@ -0,0 +1,72 @@
+import pytest
+
+from conftest import DATAMAP
+from kat import SECTIONS, CorruptDatamap, DatamapReader, DatamapWriter
+
+
+@pytest.fixture(scope="module")
+def v1() -> dict:
+    with DatamapReader(DATAMAP) as reader:
+        assert reader.version == 1
+        return reader.load()
+
+
+def write(filename: str, datamap: dict, chunk_size: int = 1024):
+    with DatamapWriter(filename, datamap["organisation"], chunk_size) as writer:
+        for obj in datamap["oois"].values():
+            writer.add("oois", obj)
+        for section in SECTIONS[1:]:
+            for origin in datamap[section]:
+                writer.add(section, origin)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1024])
+def test_round_trip(v1: dict, tmp_path, chunk_size: int):
+    filename = str(tmp_path / "datamap.kat")
+    write(filename, v1, chunk_size)
+    with DatamapReader(filename) as reader:
+        assert reader.version == 2
+        assert reader.organisation == v1["organisation"]
+        assert reader.load() == v1
+        for section in SECTIONS:
+            assert reader.count(section) == len(v1[section])
+            assert reader.chunks(section) == -(-len(v1[section]) // chunk_size)
+            assert list(reader.records(section)) == [
+                record
+                for i in range(reader.chunks(section))
+                for record in reader.chunk(section, i)
+            ]
+
+
+def test_v1_is_one_chunk(v1: dict):
+    with DatamapReader(DATAMAP) as reader:
+        assert reader.chunks("oois") == 1
+        assert reader.chunk("oois", 0) == list(v1["oois"].values())
+        assert reader.count("observations") == len(v1["observations"])
+
+
+def test_checksum_tracks_content(v1: dict, tmp_path):
+    first, second = str(tmp_path / "first.kat"), str(tmp_path / "second.kat")
+    write(first, v1)
+    write(second, {**v1, "observations": v1["observations"][1:]})
+    with DatamapReader(first) as a, DatamapReader(second) as b:
+        assert a.checksum != b.checksum
+
+
+def test_corrupt_chunk(v1: dict, tmp_path):
+    filename = tmp_path / "datamap.kat"
+    write(str(filename), v1)
+    data = bytearray(filename.read_bytes())
+    data[10] ^= 0xFF
+    filename.write_bytes(bytes(data))
+    with DatamapReader(str(filename)) as reader:
+        with pytest.raises(CorruptDatamap):
+            reader.chunk("oois", 0)
+
+
+@pytest.mark.parametrize("data", [b"", b"garbage", b"\xa7\xec\x0d\x0c\x02"])
+def test_corrupt_file(tmp_path, data: bytes):
+    filename = tmp_path / "datamap.kat"
+    filename.write_bytes(data)
+    with pytest.raises(CorruptDatamap):
+        DatamapReader(str(filename))
@@ -0,0 +1,96 @@
+import csv
+import json
+import math
+import pickle
+import random
+
+import pytest
+
+from metrics import Histogram, Metrics, label
+
+
+def exact(values: list[int], percentile: float) -> int:
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(percentile / 100 * len(ordered))) - 1]
+
+
+def test_label():
+    assert [label(p) for p in (50.0, 90.0, 99.0, 99.9)] == [
+        "p50",
+        "p90",
+        "p99",
+        "p999",
+    ]
+
+
+def test_small_values_are_exact():
+    histogram = Histogram()
+    values = list(range(128))
+    for value in values:
+        histogram.record(value)
+    for percentile in (1, 25, 50, 90, 99, 100):
+        assert histogram.percentile(percentile) == exact(values, percentile)
+
+
+@pytest.mark.parametrize("precision", [4, 7, 10])
+def test_percentiles_within_precision(precision: int):
+    rng = random.Random(precision)
+    values = [int(rng.lognormvariate(15, 2)) for _ in range(10000)]
+    histogram = Histogram(precision)
+    for value in values:
+        histogram.record(value)
+    error = 2**-precision
+    for percentile in (10, 50, 90, 99, 99.9):
+        expected = exact(values, percentile)
+        assert histogram.percentile(percentile) == pytest.approx(expected, rel=error)
+    assert histogram.percentile(100) <= histogram.max == max(values)
+    assert histogram.percentile(0) >= histogram.min == min(values)
+    assert histogram.mean() == pytest.approx(sum(values) / len(values))
+    assert len(histogram.counts) < len(set(values))
+
+
+def test_empty_and_negative():
+    histogram = Histogram()
+    assert histogram.percentile(50) == 0
+    assert histogram.summary()["count"] == 0
+    histogram.record(-5)
+    assert (histogram.min, histogram.max, histogram.percentile(99)) == (0, 0, 0)
+
+
+def test_merge():
+    rng = random.Random(0)
+    values = [rng.randrange(10**9) for _ in range(2000)]
+    whole, first, second = Histogram(), Histogram(), Histogram()
+    for i, value in enumerate(values):
+        whole.record(value)
+        (first if i % 3 else second).record(value)
+    first.merge(second)
+    assert first.counts == whole.counts
+    assert first.summary() == whole.summary()
+    empty = Histogram()
+    empty.merge(whole)
+    assert empty.summary() == whole.summary()
+
+
+def test_metrics(tmp_path):
+    metrics = Metrics()
+    for latency in (1_000_000, 2_000_000, 3_000_000):
+        metrics.record("GET /objects", latency, 200, 10, 100)
+    metrics.record("POST /observations", 5_000_000, 503, 50, 0)
+    copy = pickle.loads(pickle.dumps(metrics))
+    metrics.merge(copy)
+    objects, observations = metrics.summary()
+    assert objects["endpoint"] == "GET /objects"
+    assert objects["count"] == 6
+    assert objects["p50_ms"] == pytest.approx(2.0, rel=0.01)
+    assert objects["bytes_received"] == 600
+    assert (observations["errors"], observations["error_rate"]) == (2, 1.0)
+    assert observations["statuses"] == {"503": 2}
+    assert "GET /objects" in metrics.table()
+    metrics.export(str(tmp_path / "latency.csv"))
+    with open(tmp_path / "latency.csv") as file:
+        rows = list(csv.DictReader(file))
+    assert [row["endpoint"] for row in rows] == ["GET /objects", "POST /observations"]
+    assert "statuses" not in rows[0]
+    metrics.export(str(tmp_path / "latency.json"))
+    assert json.loads((tmp_path / "latency.json").read_text()) == metrics.summary()
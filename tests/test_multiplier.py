@@ -0,0 +1,118 @@
+from compact import CompactDatamap
+from conftest import DATAMAP
+from kat import DatamapReader
+from multiplier import Multiplier, compile_rewrite, find_network
+
+RECORDS = {
+    "oois": [
+        {
+            "object_type": "Network",
+            "primary_key": "Network|internet",
+            "name": "internet",
+        },
+        {
+            "object_type": "IPAddressV4",
+            "primary_key": "IPAddressV4|internet|10.0.0.1",
+            "network": "Network|internet",
+            "address": "10.0.0.1",
+        },
+        {
+            "object_type": "Hostname",
+            "primary_key": "Hostname|internet|internet.example",
+            "network": "Network|internet",
+            "name": "internet.example",
+        },
+        {"object_type": "Finding", "primary_key": "Finding|KAT-1", "id": "KAT-1"},
+    ],
+    "declarations": [
+        {
+            "method": None,
+            "source": "Network|internet",
+            "source_method": None,
+            "result": ["Network|internet"],
+            "task_id": None,
+        }
+    ],
+    "observations": [
+        {
+            "method": "dns",
+            "source": "Hostname|internet|internet.example",
+            "source_method": None,
+            "result": ["IPAddressV4|internet|10.0.0.1", "Finding|KAT-1"],
+            "task_id": None,
+        }
+    ],
+    "affirmations": [],
+}
+
+
+def test_find_network():
+    assert find_network(obj["primary_key"] for obj in RECORDS["oois"]) == "internet"
+    assert find_network(["Finding|KAT-1", "Network|a|b"]) is None
+
+
+def test_rewrite_touches_whole_segments_only():
+    value = {
+        "primary_key": "Hostname|internet|internet.example",
+        "refs": ["Network|internet", "internet", 3],
+        "nested": {"network": "Network|internet", "name": "internet.example"},
+    }
+    assert compile_rewrite(value, "internet")("net-0") == {
+        "primary_key": "Hostname|net-0|internet.example",
+        "refs": ["Network|net-0", "net-0", 3],
+        "nested": {"network": "Network|net-0", "name": "internet.example"},
+    }
+    assert compile_rewrite({"id": "KAT-1", "count": 1}, "internet") is None
+
+
+def test_multiplier_copies_network_records():
+    multiplier = Multiplier(RECORDS.__getitem__, 3)
+    oois = list(multiplier.oois())
+    keys = [obj["primary_key"] for obj in oois]
+    # the finding does not mention the network and is shared by every copy
+    assert len(oois) == 3 * 3 + 1
+    assert len(set(keys)) == len(keys)
+    assert "IPAddressV4|internet-1|10.0.0.1" in keys
+    assert {
+        "object_type": "Hostname",
+        "primary_key": "Hostname|internet-0|internet.example",
+        "network": "Network|internet-0",
+        "name": "internet.example",
+    } in oois
+    observations = list(multiplier.origins("observations"))
+    assert [origin["source"] for origin in observations] == [
+        "Hostname|internet|internet.example",
+        "Hostname|internet-0|internet.example",
+        "Hostname|internet-1|internet.example",
+    ]
+    assert observations[2]["result"] == [
+        "IPAddressV4|internet-1|10.0.0.1",
+        "Finding|KAT-1",
+    ]
+    assert len(list(multiplier.origins("declarations"))) == 3
+    # the base records are left untouched
+    assert RECORDS["oois"][1]["network"] == "Network|internet"
+
+
+def test_multiplier_without_network():
+    records = {"oois": RECORDS["oois"][3:], "observations": []}
+    multiplier = Multiplier(records.__getitem__, 4)
+    assert list(multiplier.oois()) == RECORDS["oois"][3:]
+
+
+def test_compact_from_reader(datamap: CompactDatamap):
+    with DatamapReader(DATAMAP) as reader:
+        doubled = CompactDatamap.from_reader(reader, 2)
+    network = find_network(datamap)
+    assert len(doubled) > len(datamap)
+    for section in ("declarations", "observations", "affirmations"):
+        copies = sum(
+            compile_rewrite(origin, network) is not None
+            for origin in datamap.origins(section)
+        )
+        assert doubled.count(section) == datamap.count(section) + copies
+    assert doubled.count("observations") > datamap.count("observations")
+    for pk in datamap:
+        assert pk in doubled
+        if f"|{network}|" in f"{pk}|":
+            assert pk.replace(f"|{network}", f"|{network}-0") in doubled
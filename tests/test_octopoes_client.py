@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from fake_octopoes import FakeOctopoes
+from octopoes_client import AsyncOctopoesClient, AsyncPool, OctopoesClient
+
+
+def observation(i: int) -> dict:
+    ooi = {"object_type": "Network", "primary_key": f"Network|{i}", "name": str(i)}
+    return {
+        "method": f"test-{i}",
+        "source": "Network|internet",
+        "source_method": None,
+        "task_id": None,
+        "result": [ooi],
+    }
+
+
+def test_batcher_uses_a_fixed_pool():
+    fake = FakeOctopoes(latency="50")
+    client = OctopoesClient("http://fake", "test", transport=fake.transport())
+    client.save_declaration(
+        {"ooi": {"object_type": "Network", "primary_key": "Network|internet"}}
+    )
+    reported = []
+    threads = threading.active_count()
+    with client.batch(
+        lambda method, res: reported.append(method), batch_size=16, linger=1.0
+    ) as batcher:
+        begin = time.perf_counter()
+        for i in range(32):
+            batcher.add("save_observation", observation(i))
+        # full batches are handed to the workers instead of sent inline
+        assert time.perf_counter() - begin < 0.5
+        assert threading.active_count() <= threads + 1 + 8
+        batcher.add("save_declaration", {"ooi": observation(0)["result"][0]})
+        batcher.add("save_declaration", {"ooi": observation(1)["result"][0]})
+        batcher.flush()
+        assert reported.count("save_observation") == 32
+        assert reported.count("save_many_declarations") == 1
+    assert len(fake.nodes["test"].oois) == 33
+
+
+def test_async_client_is_closed_asynchronously():
+    fake = FakeOctopoes()
+    client = AsyncOctopoesClient(
+        "http://fake", "test", transport=fake.async_transport()
+    )
+    with pytest.raises(TypeError):
+        client.close()
+    with pytest.raises(TypeError):
+        with client:
+            pass
+    asyncio.run(client.aclose())
+    assert client.pool.http.is_closed
+    pool = AsyncPool("http://fake", transport=fake.async_transport())
+    with pytest.raises(TypeError):
+        pool.close()
+    asyncio.run(pool.aclose())
+
+
+@pytest.fixture
+def networks() -> FakeOctopoes:
+    fake = FakeOctopoes()
+    client = OctopoesClient("http://fake", "test", transport=fake.transport())
+    client.save_many_declarations(
+        [
+            {"ooi": {"object_type": "Network", "primary_key": f"Network|{i:02}"}}
+            for i in range(25)
+        ]
+    )
+    return fake
+
+
+@pytest.mark.parametrize("page_size", [1, 5, 7, 25, 100])
+@pytest.mark.parametrize("prefetch", [False, True])
+def test_pagination(networks: FakeOctopoes, page_size: int, prefetch: bool):
+    client = OctopoesClient("http://fake", "test", transport=networks.transport())
+    objects = [obj["primary_key"] for obj in client.iter_objects(page_size, prefetch)]
+    assert objects == [f"Network|{i:02}" for i in range(25)]
+    assert client.count_objects() == 25
+    origins = list(client.iter_origins(page_size, prefetch))
+    assert len(origins) == 25
+    assert {origin["origin_type"] for origin in origins} == {"declaration"}
+
+    async def listing():
+        async with AsyncOctopoesClient(
+            "http://fake", "test", transport=networks.async_transport()
+        ) as aclient:
+            return [
+                obj["primary_key"]
+                async for obj in aclient.iter_objects(page_size, prefetch)
+            ], await aclient.count_objects()
+
+    assert asyncio.run(listing()) == (objects, 25)
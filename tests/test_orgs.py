@@ -0,0 +1,63 @@
+from dataclasses import replace
+
+from click.testing import CliRunner
+
+import stresspoes
+from conftest import DATAMAP
+from harness import StressConfig, run_stress
+from results import load_results
+from stresspoes import aggregate
+
+
+def test_aggregate(config: StressConfig, tmp_path):
+    results = str(tmp_path / "results.jsonl")
+    config = replace(
+        config,
+        latency=True,
+        fake_error_rate=0.1,
+        retries=0,
+        results_file=results,
+        append_results=True,
+    )
+    runs = [
+        run_stress(replace(config, organisation=f"org-{i}", label=f"[{i}] "))
+        for i in range(2)
+    ]
+    failures = sum(run["failure_log"].total for run in runs)
+    requests = sum(row["count"] for run in runs for row in run["metrics"].summary())
+    assert failures > 0
+    report = aggregate(runs, 2, 1.5, config)
+    lines = report.splitlines()
+    assert lines[0].startswith("org-0-")
+    assert lines[1].startswith("org-1-")
+    assert "over 2 organisations in 1.50s" in lines[2]
+    assert lines[2].endswith(f", {failures} failures")
+    assert "GET /objects" in report
+    _, summaries = load_results(results)
+    # every run appends its own summary before the aggregate
+    summary = summaries[-1]
+    assert len(summaries) == 3
+    assert summary["organisations"] == summary["workers"] == 2
+    assert summary["ops"] == sum(run["ops"] for run in runs)
+    assert sum(row["failures"] for row in summary["failures"]) == failures
+    assert sum(row["count"] for row in summary["latency"]) == requests
+    organisations = [org["organisation"] for org in summary["orgs"]]
+    assert organisations == [run["organisation"] for run in runs]
+    assert not {"environment", "metrics", "failure_log"} & set(summary["orgs"][0])
+
+
+def test_orgs_command(tmp_path):
+    results = tmp_path / "results.jsonl"
+    arguments = ["--backend", "fake", "--orgs", "3", "--workers", "2", "-t", "3"]
+    arguments += ["--backoff-min", "0.001", "--backoff-max", "0.01"]
+    arguments += ["-r", str(results), DATAMAP]
+    outcome = CliRunner().invoke(stresspoes.cli, ["-s", "stress", *arguments])
+    assert outcome.exit_code == 0, outcome.output
+    assert "over 3 organisations" in outcome.output
+    _, summaries = load_results(str(results))
+    summary = summaries[-1]
+    assert summary["success"]
+    assert summary["organisations"] == 3
+    assert summary["workers"] == 2
+    assert len({org["organisation"] for org in summary["orgs"]}) == 3
+    assert all(org["objects"] == org["expected_objects"] for org in summary["orgs"])
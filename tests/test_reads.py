@@ -0,0 +1,94 @@
+import time
+from dataclasses import replace
+
+import pytest
+
+from fake_octopoes import FakeOctopoes
+from harness import StressConfig, run_stress
+from octopoes_client import OctopoesClient, Pool
+from reads import READS, ReadLoad, parse_read_mix
+
+NETWORKS = [f"Network|{i}" for i in range(10)]
+
+
+def test_parse_read_mix():
+    assert parse_read_mix("") == {}
+    assert parse_read_mix("object=3,tree,random=0.5,") == {
+        "object": 3.0,
+        "tree": 1.0,
+        "random": 0.5,
+    }
+    for spec in ("objects", "object=x", "object=-1", "object=0,tree=0"):
+        with pytest.raises(ValueError):
+            parse_read_mix(spec)
+
+
+@pytest.mark.parametrize("sampling", ["datamap", "random"])
+def test_reads_during_a_run(config: StressConfig, sampling: str):
+    mix = ",".join(READS)
+    summary = run_stress(
+        replace(config, read_mix=mix, readers=2, read_sampling=sampling)
+    )
+    assert summary["success"]
+    load = summary["reads"]
+    assert load["sampling"] == sampling
+    assert load["ops"] > 0
+    assert load["errors"] == 0
+    assert load["unexpected"] == []
+    assert sum(row["count"] for row in load["latency"]) >= load["ops"]
+
+
+def populated() -> Pool:
+    fake = FakeOctopoes()
+    client = OctopoesClient("http://fake", "test", transport=fake.transport())
+    client.node_create("test")
+    client.save_many_declarations(
+        [{"ooi": {"object_type": "Network", "primary_key": pk}} for pk in NETWORKS]
+    )
+    return Pool("http://fake", transport=fake.transport())
+
+
+def test_unexpected_exceptions_are_counted(monkeypatch):
+    def broken(client, sample, rng):
+        raise KeyError(sample())
+
+    monkeypatch.setitem(READS, "broken", broken)
+    mix = {"object": 1, "broken": 1}
+    load = ReadLoad("http://fake", "test", mix, 2, NETWORKS, populated())
+    with load:
+        while load.ops < 50:
+            time.sleep(0.01)
+    summary = load.summary()
+    assert summary["readers"] == 2
+    (row,) = summary["unexpected"]
+    assert (row["endpoint"], row["category"]) == ("broken", "KeyError")
+    assert row["failures"] == summary["errors"] == load.unexpected.total
+    assert 0 < summary["errors"] < summary["ops"]
+    assert [row["endpoint"] for row in summary["latency"]] == ["GET /object"]
+
+
+def test_seeded(monkeypatch):
+    pool = populated()
+
+    def sequence(seed: int, ops: int) -> list[tuple[str, str]]:
+        seen = []
+
+        def recording(read: str):
+            def wrapper(client, sample, rng):
+                seen.append((read, sample()))
+
+            return wrapper
+
+        for read in ("object", "tree", "random"):
+            monkeypatch.setitem(READS, read, recording(read))
+        mix = {"object": 1, "tree": 2, "random": 1}
+        with ReadLoad("http://fake", "test", mix, 1, NETWORKS, pool, seed) as load:
+            while load.ops < ops:
+                time.sleep(0.001)
+        return seen
+
+    # readers run until stopped, so only the common prefix is compared
+    first, second = sequence(7, 20), sequence(7, 40)
+    assert second[:20] == first[:20]
+    assert {read for read, _ in first} == {"object", "tree", "random"}
+    assert sequence(8, 20)[:20] != first[:20]
@@ -0,0 +1,99 @@
+import pytest
+from click.testing import CliRunner
+
+import stresspoes
+from results import Results, compare, load_results, parse_thresholds
+
+
+def run(ops: float, wall: float, p99: float) -> dict:
+    return {
+        "datamap": "datamap.kat",
+        "multiplier": 1,
+        "ops_per_second": ops,
+        "wall_time": wall,
+        "rounds": 5,
+        "success": True,
+        "latency": [{"endpoint": "POST /observations", "p50_ms": 4.0, "p99_ms": p99}],
+    }
+
+
+def test_compare():
+    rows = {
+        row["metric"]: row
+        for row in compare(run(100, 10, 20), run(85, 10.5, 30), {}, 10.0)
+    }
+    assert set(rows) == {
+        "ops_per_second",
+        "wall_time",
+        "rounds",
+        "POST /observations p50_ms",
+        "POST /observations p99_ms",
+    }
+    # throughput is higher-is-better, times and latencies lower-is-better
+    assert rows["ops_per_second"]["change"] == pytest.approx(-0.15)
+    assert rows["ops_per_second"]["regression"]
+    assert not rows["wall_time"]["regression"]
+    assert rows["POST /observations p99_ms"]["regression"]
+    assert not rows["POST /observations p50_ms"]["regression"]
+    assert not any(
+        row["regression"] for row in compare(run(85, 10, 30), run(100, 8, 20), {}, 0)
+    )
+
+
+def test_thresholds():
+    thresholds = parse_thresholds(["ops_per_second=20", "p99_ms=60", "a=b=1.5"])
+    assert thresholds == {"ops_per_second": 20.0, "p99_ms": 60.0, "a=b": 1.5}
+    rows = compare(run(100, 10, 20), run(85, 12, 30), thresholds, 10.0)
+    regressed = {row["metric"] for row in rows if row["regression"]}
+    assert regressed == {"wall_time"}
+    with pytest.raises(ValueError):
+        parse_thresholds(["ops_per_second"])
+
+
+def test_zero_baseline_is_not_a_regression():
+    (row,) = compare({"rounds": 0}, {"rounds": 3}, {}, 10.0)
+    assert row["change"] == 0.0
+    assert not row["regression"]
+
+
+def test_load_results(tmp_path):
+    filename = str(tmp_path / "results.jsonl")
+    with Results(filename) as results:
+        results.round(round=1, objects=3)
+        results.summary(**run(100, 10, 20))
+        results.sweep(steps=[])
+    with open(filename, "a") as file:
+        file.write("\n")
+    with Results(filename, append=True) as results:
+        results.summary(**run(90, 10, 20))
+    rounds, summaries = load_results(filename)
+    assert rounds == [{"type": "round", "round": 1, "objects": 3}]
+    assert [summary["ops_per_second"] for summary in summaries] == [100, 90]
+
+
+def test_compare_command(tmp_path):
+    files = {}
+    for name, summary in {
+        "baseline": run(100, 10, 20),
+        "same": run(98, 10, 20),
+        "slower": run(70, 10, 20),
+    }.items():
+        files[name] = str(tmp_path / f"{name}.jsonl")
+        with Results(files[name]) as results:
+            results.summary(**summary)
+
+    def invoke(*arguments: str):
+        return CliRunner().invoke(stresspoes.cli, ["-s", "compare", *arguments])
+
+    assert invoke(files["baseline"], files["same"]).exit_code == 0
+    outcome = invoke(files["baseline"], files["same"], files["slower"])
+    assert outcome.exit_code == 1
+    assert "REGRESSION" in outcome.output.split("slower.jsonl")[-1]
+    assert "REGRESSION" not in outcome.output.split("slower.jsonl")[0]
+    arguments = ["-r", "ops_per_second=50", files["baseline"], files["slower"]]
+    assert invoke(*arguments).exit_code == 0
+    empty = tmp_path / "empty.jsonl"
+    empty.write_text("")
+    outcome = invoke(files["baseline"], str(empty))
+    assert outcome.exit_code == 1
+    assert "No run summary" in outcome.output
@@ -0,0 +1,86 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+import stresspoes
+from conftest import DATAMAP
+from harness import StressConfig
+from sweep import exponents, growth_exponent, step, table
+
+
+def summary(oois: int, concurrency: int) -> dict:
+    return {
+        "datamap": {"oois": oois},
+        "concurrency": concurrency,
+        "phases": {
+            "declarations": oois / 1000,
+            "ingest": oois**2 / 1000 / concurrency,
+            "recalculate": 1.0,
+            "quiescence": None,
+        },
+        "ops_per_second": oois / concurrency,
+        "success": oois < 400,
+    }
+
+
+def test_growth_exponent():
+    sizes = [10, 20, 40, 80]
+    assert growth_exponent(sizes, [size**1.5 for size in sizes]) == pytest.approx(1.5)
+    assert growth_exponent(sizes, [3.0] * 4) == pytest.approx(0.0)
+    assert growth_exponent([10, 10], [1.0, 2.0]) is None
+    assert growth_exponent([10, 20], [0.0, 2.0]) is None
+
+
+def test_exponents_per_concurrency():
+    steps = [
+        step(summary(oois, concurrency), size)
+        for size, oois in ((1, 100), (2, 200), (4, 400))
+        for concurrency in (1, 4)
+    ]
+    fits = exponents(steps)
+    assert list(fits) == [1, 4]
+    for fit in fits.values():
+        assert fit["declarations"] == pytest.approx(1.0)
+        assert fit["ingest"] == pytest.approx(2.0)
+        assert fit["recalculate"] == pytest.approx(0.0)
+        assert fit["ops_per_second"] == pytest.approx(1.0)
+        assert fit["bits"] is None
+        assert fit["quiescence"] is None
+    lines = table(steps).splitlines()
+    assert len(lines) == 1 + len(steps) + len(fits)
+    assert sum(line.endswith(" FAIL") for line in lines) == 2
+    assert "ingest n^2.00 (superlinear)" in lines[-1]
+    assert "declarations n^1.00," in lines[-1]
+
+
+def test_failed_step_keeps_the_partial_sweep(monkeypatch, tmp_path):
+    configs = []
+
+    def run_stress(config: StressConfig) -> dict | None:
+        configs.append(config)
+        if len(configs) == 4:
+            return None
+        return summary(100 * config.multiplier, config.concurrency)
+
+    monkeypatch.setattr(stresspoes, "run_stress", run_stress)
+    results = tmp_path / "sweep.jsonl"
+    arguments = ["-m", "1,2,4", "-c", "1,2", "-r", str(results), DATAMAP]
+    outcome = CliRunner().invoke(
+        stresspoes.cli, ["-s", "sweep", "--backend", "fake", *arguments]
+    )
+    assert outcome.exit_code == 1
+    assert [config.label for config in configs] == [
+        "[1x1] ",
+        "[1x2] ",
+        "[2x1] ",
+        "[2x2] ",
+    ]
+    assert "Sweep step 2x2 failed" in outcome.output
+    assert "growth (c=1): declarations n^1.00" in outcome.output
+    (record,) = [json.loads(line) for line in results.read_text().splitlines()]
+    assert record["type"] == "sweep"
+    assert record["failed"] == "2x2"
+    assert [row["size"] for row in record["steps"]] == [1, 1, 2]
+    assert record["exponents"]["1"]["ingest"] == pytest.approx(2.0)
+    assert record["exponents"]["2"]["ingest"] is None
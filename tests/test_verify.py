@@ -0,0 +1,102 @@
+from typing import Any
+
+from compact import CompactDatamap
+from verify import Verification, origin_key
+
+SECTIONS = ("declarations", "observations")
+
+
+def graph(datamap: CompactDatamap) -> tuple[list[dict], list[dict]]:
+    objects = [datamap.ooi(pk) for pk in datamap]
+    origins = [origin for section in SECTIONS for origin in datamap.origins(section)]
+    return objects, origins
+
+
+def key(origin: dict[str, Any]) -> tuple:
+    return origin_key(
+        origin["origin_type"],
+        origin["method"],
+        origin["source_method"],
+        origin["source"],
+    )
+
+
+def test_identical_graph(datamap: CompactDatamap):
+    verification = Verification(datamap, SECTIONS, content=True).run(*graph(datamap))
+    assert verification.ok
+    assert verification.sections["oois"].actual == len(datamap)
+    assert not verification.details()
+
+
+def test_missing(datamap: CompactDatamap):
+    objects, origins = graph(datamap)
+    ooi = objects.pop()
+    observation = next(o for o in origins if o["origin_type"] == "observation")
+    origins.remove(observation)
+    verification = Verification(datamap, SECTIONS).run(objects, origins)
+    assert not verification.ok
+    assert verification.sections["oois"].missing == [ooi["primary_key"]]
+    assert verification.sections["observations"].missing == [key(observation)]
+    assert verification.sections["declarations"].ok
+
+
+def test_extra(datamap: CompactDatamap):
+    objects, origins = graph(datamap)
+    source = objects[0]["primary_key"]
+    objects.append({"object_type": "Network", "primary_key": "Network|extra"})
+    origins.append(
+        {
+            "origin_type": "observation",
+            "method": "extra",
+            "source_method": None,
+            "source": source,
+            "result": ["Network|extra"],
+        }
+    )
+    verification = Verification(datamap, SECTIONS).run(objects, origins)
+    assert verification.sections["oois"].extra == ["Network|extra"]
+    assert verification.sections["observations"].extra == [("extra", None, source)]
+    assert verification.sections["observations"].missing == []
+
+
+def test_mismatched(datamap: CompactDatamap):
+    objects, origins = graph(datamap)
+    observation = next(o for o in origins if len(o["result"]) > 1)
+    dropped = observation["result"].pop()
+    objects[0] = {**objects[0], "changed": True}
+    verification = Verification(datamap, SECTIONS, content=True).run(objects, origins)
+    (mismatch,) = verification.sections["observations"].mismatched
+    assert mismatch == {"origin": key(observation), "missing": [dropped], "extra": []}
+    assert verification.sections["oois"].mismatched == [objects[0]["primary_key"]]
+
+
+def test_scan_profiles_are_ignored(datamap: CompactDatamap):
+    objects, origins = graph(datamap)
+    objects = [{**obj, "scan_profile": None, "user_id": 1} for obj in objects]
+    assert Verification(datamap, SECTIONS, content=True).run(objects, origins).ok
+
+
+def test_declarations_ignore_method(datamap: CompactDatamap):
+    objects, origins = graph(datamap)
+    for origin in origins:
+        if origin["origin_type"] == "declaration":
+            origin["method"] = "manual"
+    assert Verification(datamap, SECTIONS).run(objects, origins).ok
+
+
+def test_dangling_inference(datamap: CompactDatamap):
+    objects, origins = graph(datamap)
+    source = objects[0]["primary_key"]
+    origins.append(
+        {
+            "origin_type": "inference",
+            "method": "bit",
+            "source_method": None,
+            "source": source,
+            "result": ["Network|gone"],
+        }
+    )
+    verification = Verification(datamap, SECTIONS).run(objects, origins)
+    (dangling,) = verification.sections["inferences"].mismatched
+    assert dangling["dangling"] == ["Network|gone"]
+    assert verification.origin_counts["inference"] == 1